@@ -1,24 +1,94 @@
+import time
+LAUNCH_TIME = time.perf_counter() # Taken before the other imports so they count towards the startup report
+
 import tkinter as tk
 from tkinter import messagebox, ttk
-from tkcalendar import DateEntry
+import argparse
+import bisect
+import heapq
 import sqlite3
+import html
 import json
 import os
+import queue
+import socket
 import sys
+import threading
 from PIL import Image, ImageTk
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
 
 DATABASE_FILE = "timetable.db"
 SETTINGS_FILE = "settings.json"
+LOCK_FILE = "revision_manager.lock" # Holds the port and process id of the running copy of the app
+
+# How long a later launch keeps trying to reach the running copy before giving up, in seconds
+LOCK_TIMEOUT = 10
 DEFAULT_SETTINGS = {
     "auto_reschedule": True,
     "max_tasks_lesson": 1,
     "max_tasks_afternoon": 3,
+    "default_task_minutes": 30,
     "week_rotation_length": 2,
     "use_lettered_weeks": False,
     "start_week_date": "2024-11-18"
 }
 
+# Number of weeks kept in memory so flicking between them doesn't hit the database
+WEEK_CACHE_SIZE = 8
+
+# Version of the database layout, bumped whenever init_db or update_db change it
+SCHEMA_VERSION = 5
+
+# Startup phases and how long after launch they finished, in seconds
+STARTUP_TIMES = []
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_ORDINALS = {day: ordinal for ordinal, day in enumerate(DAYS_OF_WEEK)}
+
+# Periods of the school day, stored in the Periods table and referenced by id
+Period = namedtuple("Period", ["id", "ordinal", "label", "start_time", "end_time", "kind", "capacity"])
+PERIOD_KINDS = ["lesson", "free", "after_school"]
+DEFAULT_PERIODS = [
+    # (ordinal, label, start_time, end_time, kind)
+    (1, "1", None, None, "lesson"),
+    (2, "2", None, None, "lesson"),
+    (3, "3", None, None, "lesson"),
+    (4, "4", None, None, "lesson"),
+    (5, "5", None, None, "lesson"),
+    (6, "After School", "16:00", None, "after_school")
+]
+
+# Days off, stored in the HolidayRanges table as inclusive ranges of YYYY-MM-DD dates
+HolidayRange = namedtuple("HolidayRange", ["id", "start_date", "end_date", "label"])
+DEFAULT_HOLIDAY_LABEL = "Holiday"
+
+# Subjects which count as free study when rescheduling tasks into lessons
+STUDY_SUBJECTS = ["Supp"]
+
+# Task priorities, stored in the Tasks table as their index
+PRIORITIES = ["Low", "Normal", "High"]
+DEFAULT_PRIORITY = 1
+
+# Tasks with no due date sort after every real one when rescheduling
+NO_DUE_DATE = "9999-12-31"
+
+# How many days ahead the rescheduler looks for free periods before giving up on a task
+PLACEMENT_HORIZON_DAYS = 365
+
+# When the school day ends and the afternoon reschedule pass runs, if no after school period has a start time
+SCHOOL_DAY_END = "16:00"
+
+# Longest the app waits between checking whether a reschedule pass is due, in case the machine slept or the clock jumped
+MAX_RESCHEDULE_WAIT = timedelta(minutes=15)
+
+# Incomplete tasks listed in the backlog, as loaded a page at a time
+BacklogTask = namedtuple("BacklogTask", ["id", "task", "date", "period_id", "ordinal", "due_date", "priority", "effort"])
+BACKLOG_PAGE_SIZE = 50
+
+# Moves older than this many days are squashed into one entry per task in the move log
+MOVE_LOG_DAYS = 28
+
 def get_assets_path():
     if getattr(sys, "frozen", False):
         # If the program is running as a bundled executable
@@ -38,12 +108,33 @@ def get_data_path():
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, "data")
 
+# Move a YYYY-MM-DD date string by a number of days
+def shift_date(date_str, days):
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
 def load_data(datafile):
     with open(os.path.join(get_data_path(), f"{datafile}.json")) as file:
         data = json.load(file)
 
     return data
 
+# Record that a startup phase has finished
+def mark_startup(phase):
+    STARTUP_TIMES.append((phase, time.perf_counter() - LAUNCH_TIME))
+
+# Print the startup timings and save them to startup_timing.txt (run with --timing)
+def report_startup():
+    lines = ["Startup timing:"]
+    previous = 0
+    for phase, elapsed in STARTUP_TIMES:
+        lines.append(f"  {phase:<24} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)")
+        previous = elapsed
+
+    report = "\n".join(lines)
+    print(report)
+    with open("startup_timing.txt", "w") as file:
+        file.write(report + "\n")
+
 # Save Data Management Class
 class SaveManager:
 
@@ -57,14 +148,16 @@ class SaveManager:
 
         # Update settings to contain any variables not found
         else:
-            updated_settings = DEFAULT_SETTINGS
+            updated_settings = dict(DEFAULT_SETTINGS)
             settings = SaveManager.load_settings()
 
             # Input existing values over default values
             for key, value in settings.items():
                 updated_settings.update({key: value})
 
-            SaveManager.save_settings(updated_settings)
+            # Only rewrite the file if something was missing
+            if updated_settings != settings:
+                SaveManager.save_settings(updated_settings)
 
     # Load settings from the file
     def load_settings():
@@ -97,12 +190,34 @@ class SaveManager:
     def init_db():
         conn = sqlite3.connect(DATABASE_FILE)
         c = conn.cursor()
+
+        # Skip setting up the database if it is already up to date
+        if c.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            conn.close()
+            return
+
+        # Create a Periods table for the periods of the school day
+        c.execute("""CREATE TABLE IF NOT EXISTS Periods (
+                        id INTEGER PRIMARY KEY,
+                        ordinal INTEGER NOT NULL,
+                        label TEXT NOT NULL,
+                        start_time TEXT,
+                        end_time TEXT,
+                        kind TEXT NOT NULL DEFAULT 'lesson',
+                        capacity INTEGER
+                    )"""
+        )
+
+        # Fill in the default periods if there are none yet
+        if c.execute("SELECT COUNT(*) FROM Periods").fetchone()[0] == 0:
+            c.executemany("INSERT INTO Periods (ordinal, label, start_time, end_time, kind) VALUES (?, ?, ?, ?, ?)", DEFAULT_PERIODS)
+
         # Create a Subjects table for recurring weekly subjects
         c.execute("""CREATE TABLE IF NOT EXISTS Subjects (
                         id INTEGER PRIMARY KEY,
                         week TEXT,
                         day TEXT,
-                        period TEXT,
+                        period_id INTEGER REFERENCES Periods(id),
                         subject TEXT
                     )"""
         )
@@ -112,14 +227,33 @@ class SaveManager:
                         id INTEGER PRIMARY KEY,
                         task TEXT,
                         date TEXT,
-                        period TEXT,
-                        completed BOOLEAN DEFAULT 0
+                        period_id INTEGER REFERENCES Periods(id),
+                        completed BOOLEAN DEFAULT 0,
+                        due_date TEXT,
+                        priority INTEGER DEFAULT 1,
+                        effort INTEGER
                     )"""
         )
 
-        # Create a Holidays table for holiday dates
-        c.execute("""CREATE TABLE IF NOT EXISTS Holidays (
-                        date TEXT PRIMARY KEY
+        # Create a TaskMoves table logging every time a task is moved, by hand or by the rescheduler
+        c.execute("""CREATE TABLE IF NOT EXISTS TaskMoves (
+                        id INTEGER PRIMARY KEY,
+                        task_id INTEGER NOT NULL,
+                        from_date TEXT,
+                        from_period_id INTEGER,
+                        to_date TEXT,
+                        to_period_id INTEGER,
+                        reason TEXT,
+                        moved_at TEXT
+                    )"""
+        )
+
+        # Create a HolidayRanges table for holidays and term breaks, from start_date to end_date inclusive
+        c.execute("""CREATE TABLE IF NOT EXISTS HolidayRanges (
+                        id INTEGER PRIMARY KEY,
+                        start_date TEXT NOT NULL,
+                        end_date TEXT NOT NULL,
+                        label TEXT
                     )"""
         )
 
@@ -148,39 +282,944 @@ class SaveManager:
                 c.execute("UPDATE Subjects SET week = 2 WHERE week = 'B'")
                 conn.commit()
 
+        # Move the old free-text period columns over to integer period ids
+        for table in ["Subjects", "Tasks"]:
+            c.execute(f"PRAGMA table_info({table})")
+            column_names = [col[1] for col in c.fetchall()]
+
+            if "period" in column_names:
+                # Add any period labels which aren't in the Periods table yet
+                c.execute(f"SELECT DISTINCT period FROM {table} WHERE period NOT IN (SELECT label FROM Periods)")
+                for label, in c.fetchall():
+                    c.execute("INSERT INTO Periods (ordinal, label, kind) VALUES ((SELECT MAX(ordinal) + 1 FROM Periods), ?, 'lesson')", (label,))
+
+                c.execute(f"ALTER TABLE {table} ADD COLUMN period_id INTEGER REFERENCES Periods(id)")
+                c.execute(f"UPDATE {table} SET period_id = (SELECT id FROM Periods WHERE label = {table}.period)")
+                c.execute(f"ALTER TABLE {table} DROP COLUMN period")
+                conn.commit()
+
+        # Add due dates, priorities and estimated minutes of effort to tasks
+        c.execute("PRAGMA table_info(Tasks)")
+        column_names = [col[1] for col in c.fetchall()]
+        for column, definition in [("due_date", "TEXT"), ("priority", f"INTEGER DEFAULT {DEFAULT_PRIORITY}"), ("effort", "INTEGER")]:
+            if column not in column_names:
+                c.execute(f"ALTER TABLE Tasks ADD COLUMN {column} {definition}")
+        conn.commit()
+
+        # Merge the old one-row-per-day Holidays table into ranges of consecutive days
+        c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'Holidays'")
+        if c.fetchone():
+            ranges = []
+            for date_str, in c.execute("SELECT date FROM Holidays ORDER BY date").fetchall():
+                if ranges and shift_date(ranges[-1][1], 1) == date_str:
+                    ranges[-1][1] = date_str
+                else:
+                    ranges.append([date_str, date_str])
+
+            c.executemany("INSERT INTO HolidayRanges (start_date, end_date, label) VALUES (?, ?, ?)", [(start, end, DEFAULT_HOLIDAY_LABEL) for start, end in ranges])
+            c.execute("DROP TABLE Holidays")
+            conn.commit()
+
+        # Index tasks by date and period for the capacity checks
+        c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_date_period ON Tasks (date, period_id)")
+
+        # Index incomplete tasks by date, so the backlog can be paged through in date order
+        c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_backlog ON Tasks (completed, date)")
+
+        # Index the move log by task for the history window, and by time for compaction
+        c.execute("CREATE INDEX IF NOT EXISTS idx_task_moves_task ON TaskMoves (task_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_task_moves_moved_at ON TaskMoves (moved_at)")
+
+        # Mark the database as up to date so the next launch can skip all of this
+        c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+
+        conn.close()
+
+    # Load the periods of the school day in order
+    def load_periods():
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT id, ordinal, label, start_time, end_time, kind, capacity FROM Periods ORDER BY ordinal, id")
+        periods = [Period(*row) for row in c.fetchall()]
+        conn.close()
+        return periods
+
+    # Save edited periods, adding new ones (id of None) and removing any not in the list
+    def save_periods(periods):
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        kept_ids = [period.id for period in periods if period.id is not None]
+        c.execute(f"DELETE FROM Periods WHERE id NOT IN ({", ".join("?" * len(kept_ids))})", kept_ids)
+
+        for period in periods:
+            values = (period.ordinal, period.label, period.start_time, period.end_time, period.kind, period.capacity)
+            if period.id is None:
+                c.execute("INSERT INTO Periods (ordinal, label, start_time, end_time, kind, capacity) VALUES (?, ?, ?, ?, ?, ?)", values)
+            else:
+                c.execute("UPDATE Periods SET ordinal = ?, label = ?, start_time = ?, end_time = ?, kind = ?, capacity = ? WHERE id = ?", values + (period.id,))
+
+        conn.commit()
+        conn.close()
+
+    # Load the holiday ranges in date order
+    def load_holiday_ranges():
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT id, start_date, end_date, label FROM HolidayRanges ORDER BY start_date")
+        ranges = [HolidayRange(*row) for row in c.fetchall()]
+        conn.close()
+        return ranges
+
+    # Replace every holiday range with the given (start_date, end_date, label) tuples
+    def save_holiday_ranges(ranges):
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("DELETE FROM HolidayRanges")
+        c.executemany("INSERT INTO HolidayRanges (start_date, end_date, label) VALUES (?, ?, ?)", ranges)
+        conn.commit()
+        conn.close()
+
+    # Check whether any subjects or tasks still use a period
+    def is_period_in_use(period_id):
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT EXISTS (SELECT 1 FROM Subjects WHERE period_id = ?) OR EXISTS (SELECT 1 FROM Tasks WHERE period_id = ?)", (period_id, period_id))
+        in_use = c.fetchone()[0]
+        conn.close()
+        return bool(in_use)
+
+# One task in a loaded week, kept small since many weeks of them can be cached
+class TaskRecord:
+    __slots__ = ("id", "task", "completed", "due_date", "priority", "effort", "late")
+
+    def __init__(self, task_id, task, completed, due_date=None, priority=DEFAULT_PRIORITY, effort=None, late=False):
+        self.id = task_id
+        self.task = task
+        self.completed = completed
+        self.due_date = due_date
+        self.priority = priority
+        self.effort = effort # Estimated minutes, or None to use the default task length
+        self.late = late # Scheduled after its due date
+
+# Holiday ranges sorted by start date, so finding whether a day is off is a binary search rather than a scan.
+# The ranges never overlap, so their end dates are in order too
+class HolidayIndex:
+
+    def __init__(self, ranges):
+        self.ranges = sorted(ranges, key=lambda holiday: holiday.start_date)
+        self.start_dates = [holiday.start_date for holiday in self.ranges]
+
+    # Get the range covering a date string, or None if it isn't a holiday
+    def find(self, date_str):
+        i = bisect.bisect_right(self.start_dates, date_str) - 1
+        if i >= 0 and self.ranges[i].end_date >= date_str:
+            return self.ranges[i]
+        return None
+
+    def is_off(self, date_str):
+        return self.find(date_str) is not None
+
+    # Get the ranges overlapping first_date to last_date
+    def ranges_between(self, first_date, last_date):
+        start = max(bisect.bisect_right(self.start_dates, first_date) - 1, 0)
+        end = bisect.bisect_right(self.start_dates, last_date)
+        return [holiday for holiday in self.ranges[start:end] if holiday.end_date >= first_date]
+
+# Subjects, tasks and holidays for one week. Cells are stored in flat lists indexed by
+# day_ordinal * period_count + period_index, where period_index is the period's position in the day
+class WeekModel:
+    __slots__ = ("week_start_date", "week_number", "period_count", "subjects", "tasks", "holidays")
+
+    def __init__(self, week_start_date, week_number, period_count):
+        self.week_start_date = week_start_date
+        self.week_number = week_number
+        self.period_count = period_count
+        self.subjects = [None] * (len(DAYS_OF_WEEK) * period_count) # Subject name, or None if free
+        self.tasks = [None] * (len(DAYS_OF_WEEK) * period_count) # List of TaskRecords, or None if there are none
+        self.holidays = [None] * len(DAYS_OF_WEEK) # Holiday label, or None if it's a normal day
+
+    def get_subject(self, day_ordinal, period_index):
+        return self.subjects[day_ordinal * self.period_count + period_index]
+
+    def get_tasks(self, day_ordinal, period_index):
+        return self.tasks[day_ordinal * self.period_count + period_index] or []
+
+    def add_task(self, day_ordinal, period_index, record):
+        cell = day_ordinal * self.period_count + period_index
+        if self.tasks[cell] is None:
+            self.tasks[cell] = []
+        self.tasks[cell].append(record)
+
+# Cache of recently viewed weeks, keyed by the week's start date and evicting the least recently used
+class WeekCache:
+
+    def __init__(self, max_weeks=WEEK_CACHE_SIZE):
+        self.max_weeks = max_weeks
+        self.weeks = OrderedDict()
+        self.lock = threading.Lock() # Weeks are prefetched from a background thread
+        self.generation = 0 # Bumped on every invalidation so prefetches which started before it are thrown away
+
+    def __contains__(self, week_key):
+        with self.lock:
+            return week_key in self.weeks
+
+    # Get a cached week and mark it as recently used
+    def get(self, week_key):
+        with self.lock:
+            model = self.weeks.get(week_key)
+            if model is not None:
+                self.weeks.move_to_end(week_key)
+            return model
+
+    # Add a week, unless it was built before the latest invalidation
+    def put(self, week_key, model, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self.weeks[week_key] = model
+            self.weeks.move_to_end(week_key)
+            while len(self.weeks) > self.max_weeks:
+                self.weeks.popitem(last=False)
+
+    # Drop the given weeks
+    def invalidate(self, week_keys):
+        with self.lock:
+            self.generation += 1
+            for week_key in week_keys:
+                self.weeks.pop(week_key, None)
+
+    # Drop every week on a given week of the rotation
+    def invalidate_week_number(self, week_number):
+        with self.lock:
+            self.generation += 1
+            for week_key in [key for key, model in self.weeks.items() if model.week_number == week_number]:
+                del self.weeks[week_key]
+
+# Source of the current time, swapped for a SimulatedClock when testing the rescheduler
+class Clock:
+
+    def now(self):
+        return datetime.now()
+
+    # Midnight at the start of the current day
+    def today(self):
+        return self.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Clock which only moves when told to, for replaying days of rescheduling without waiting for them
+class SimulatedClock(Clock):
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def advance(self, delta):
+        self.current += delta
+
+# Timetable data and auto-rescheduling, with no UI so it can also run headless
+class Timetable:
+
+    def __init__(self, clock=None):
+        self.clock = clock or Clock()
+        self.load_timetable()
+
+    def load_timetable(self):
+        """Load the settings and periods the timetable depends on."""
+        self.settings = SaveManager.load_settings()
+
+        # Define the start date for Week 1
+        self.start_date = datetime.strptime(self.settings.get("start_week_date", "2024-11-18"), "%Y-%m-%d")
+
+        # Load custom week rotation length and week display type from settings
+        self.week_rotation_length = self.settings.get("week_rotation_length", 2)
+        self.use_lettered_weeks = self.settings.get("use_lettered_weeks", False)
+
+        # Load the periods of the day, looked up by their id, and their position in the day
+        self.periods = SaveManager.load_periods()
+        self.period_lookup = {period.id: period for period in self.periods}
+        self.period_index = {period.id: index for index, period in enumerate(self.periods)}
+
+        self.holiday_index = HolidayIndex(SaveManager.load_holiday_ranges())
+
+    def invalidate_dates(self, *dates):
+        """Called after tasks or holidays on the given dates change. Does nothing here, the app uses it to drop cached weeks."""
+        pass
+
+    def build_week_model(self, week_start_date):
+        """Load the subjects, tasks and holidays for one week. This doesn't touch any widgets, so it can run in the background."""
+        model = WeekModel(week_start_date, self.get_week_number_for_date(week_start_date), len(self.periods))
+
+        # Day ordinal of each date string in the week
+        date_ordinals = {(week_start_date + timedelta(days=ordinal)).strftime("%Y-%m-%d"): ordinal for ordinal in range(len(DAYS_OF_WEEK))}
+        first_date = min(date_ordinals)
+        last_date = max(date_ordinals)
+
+        # Load subjects for the week type (skipping any for periods which no longer exist)
+        for day, period_id, subject in self.get_subjects_for_week(week_start_date):
+            if period_id in self.period_index:
+                model.subjects[DAY_ORDINALS[day] * model.period_count + self.period_index[period_id]] = subject
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        # Load tasks that are date-specific, only for this week
+        c.execute("SELECT id, task, date, period_id, completed, due_date, priority, effort FROM Tasks WHERE date BETWEEN ? AND ? ORDER BY id", (first_date, last_date))
+        for task_id, task, date_str, period_id, completed, due_date, priority, effort in c.fetchall():
+            if period_id in self.period_index:
+                late = bool(due_date) and not completed and date_str > due_date
+                model.add_task(date_ordinals[date_str], self.period_index[period_id], TaskRecord(task_id, task, completed, due_date, priority, effort, late))
+
+        conn.close()
+
+        # Mark which days of the week are holidays
+        for holiday in self.holiday_index.ranges_between(first_date, last_date):
+            for date_str, ordinal in date_ordinals.items():
+                if holiday.start_date <= date_str <= holiday.end_date:
+                    model.holidays[ordinal] = holiday.label or DEFAULT_HOLIDAY_LABEL
+
+        return model
+
+    # --Holiday Management--
+
+    def is_holiday(self, date):
+        return self.holiday_index.is_off(date.strftime("%Y-%m-%d"))
+
+    def set_holiday_range(self, start_date, end_date, label=DEFAULT_HOLIDAY_LABEL):
+        """Mark every day from start_date to end_date (inclusive) as a holiday with the given label, or as a normal day again if label is None.
+        Existing ranges are cut around the new one, and ranges which touch and share a label are joined, so the ranges never overlap."""
+        start = start_date.strftime("%Y-%m-%d")
+        end = end_date.strftime("%Y-%m-%d")
+
+        # Keep the parts of existing ranges outside start to end
+        ranges = []
+        for holiday in self.holiday_index.ranges:
+            if holiday.end_date < start or holiday.start_date > end:
+                ranges.append((holiday.start_date, holiday.end_date, holiday.label))
+                continue
+            if holiday.start_date < start:
+                ranges.append((holiday.start_date, shift_date(start, -1), holiday.label))
+            if holiday.end_date > end:
+                ranges.append((shift_date(end, 1), holiday.end_date, holiday.label))
+
+        if label is not None:
+            ranges.append((start, end, label))
+        ranges.sort()
+
+        # Join touching ranges with the same label, so marking days one at a time still builds one range
+        merged = []
+        for holiday in ranges:
+            if merged and merged[-1][2] == holiday[2] and shift_date(merged[-1][1], 1) >= holiday[0]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], holiday[1]), holiday[2])
+            else:
+                merged.append(holiday)
+
+        SaveManager.save_holiday_ranges(merged)
+        self.holiday_index = HolidayIndex(SaveManager.load_holiday_ranges())
+        self.invalidate_dates(*[start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)])
+
+    # --Auto Rescheduling--
+
+    def run_reschedule_pass(self):
+        """Clear old completed tasks and move incomplete ones on, depending on the time of day. Returns the ids of tasks which will miss their due date."""
+        self.clear_old_completed_tasks()  # Clear old completed tasks first
+        self.compact_move_log()
+        if self.clock.now() >= self.get_school_day_end(self.clock.today()):
+            # 3:30 PM rescheduling, starting with today's after school periods
+            return self.reschedule_incomplete_tasks(self.clock.today(), after_school=True)
+        else:
+            # Midnight rescheduling, starting with today's periods
+            return self.reschedule_incomplete_tasks(self.clock.today(), after_school=False)
+
+    def get_school_day_end(self, date):
+        """The time on date when the school day ends and the afternoon pass runs: the start of the first after school period."""
+        start_times = [datetime.strptime(period.start_time, "%H:%M") for period in self.get_periods_of_kind("after_school") if period.start_time]
+        end_time = min(start_times, default=datetime.strptime(SCHOOL_DAY_END, "%H:%M"))
+        return date.replace(hour=end_time.hour, minute=end_time.minute, second=0, microsecond=0)
+
+    def get_next_reschedule_time(self, after):
+        """When the next reschedule pass is due after the given time: the end of that school day, or else the next midnight.
+        Midnight on a Monday is also when last week's completed tasks are cleared, so there's no separate start of week trigger."""
+        day_end = self.get_school_day_end(after)
+        if after < day_end:
+            return day_end
+        return after.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def clear_old_completed_tasks(self):
+        """Remove all completed tasks from the database if they are from a previous week."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        today_date = self.clock.today()
+        cutoff_date = today_date - timedelta(days=today_date.weekday())  # Start of current week
+        c.execute("SELECT DISTINCT date FROM Tasks WHERE completed = 1 AND date < ?", (cutoff_date.strftime("%Y-%m-%d"),))
+        dates = [row[0] for row in c.fetchall()]
+        # Their moves go too, since SQLite can hand a deleted task's id to a new one
+        c.execute("DELETE FROM TaskMoves WHERE task_id IN (SELECT id FROM Tasks WHERE completed = 1 AND date < ?)", (cutoff_date.strftime("%Y-%m-%d"),))
+        c.execute("DELETE FROM Tasks WHERE completed = 1 AND date < ?", (cutoff_date.strftime("%Y-%m-%d"),))
+        conn.commit()
+        conn.close()
+        self.invalidate_dates(*dates)
+
+    def reschedule_incomplete_tasks(self, date, after_school):
+        """Move incomplete tasks from earlier days into free periods from date onwards, earliest due date first.
+        At 3:30 PM (after_school) only tasks from lessons are moved, and only after school periods are used on the first day.
+        Returns the ids of tasks which will miss their due date, including any which couldn't be placed at all."""
+        today_date = date.strftime("%Y-%m-%d")
+        after_school_ids = [period.id for period in self.get_periods_of_kind("after_school")]
+
+        # Heap of incomplete tasks from earlier days (leaving after school ones until midnight at 3:30 PM),
+        # ordered by due date, then highest priority, then whichever task has waited longest
+        tasks = self.iter_backlog(before_date=today_date, exclude_period_ids=after_school_ids if after_school else ())
+        heap = [(task.due_date or NO_DUE_DATE, -(DEFAULT_PRIORITY if task.priority is None else task.priority), task.date, task.id, self.get_task_effort(task.effort))
+                for task in tasks]
+        if not heap:
+            return []
+        heapq.heapify(heap)
+
+        moves = []
+        late_ids = []
+        for date_str, period_id, free_minutes, empty in self.iter_free_periods(date, after_school):
+            # Fill the period with the most urgent tasks while they fit. A task longer than a whole period
+            # still goes into an empty one, otherwise it could never be placed
+            while heap and (heap[0][4] <= free_minutes or empty):
+                due_date, _, _, task_id, effort = heapq.heappop(heap)
+                moves.append((task_id, date_str, period_id))
+                if due_date < date_str:
+                    late_ids.append(task_id)
+                free_minutes -= effort
+                empty = False
+
+            if not heap:
+                break
+
+        # Anything left had no room within the horizon, so stays where it is
+        late_ids += [entry[3] for entry in heap]
+
+        self.move_tasks(moves, "Auto-rescheduled after school" if after_school else "Auto-rescheduled at midnight")
+        return late_ids
+
+    def iter_free_periods(self, date, after_school):
+        """Yield (date string, period id, free minutes, whether it is empty) for every period tasks can be moved into, in time order from date onwards.
+        Subjects, holidays and the minutes already used are loaded up front so walking the days doesn't touch the database."""
+        first_date = date.strftime("%Y-%m-%d")
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        # Minutes of tasks already in each period from date onwards
+        c.execute("SELECT date, period_id, SUM(COALESCE(effort, ?)) FROM Tasks WHERE date >= ? GROUP BY date, period_id", (self.settings["default_task_minutes"], first_date))
+        used_minutes = {(date_str, period_id): minutes for date_str, period_id, minutes in c.fetchall()}
+
+        conn.close()
+
+        subjects = self.get_subject_lookup()
+
+        period_minutes = [(period, self.get_period_minutes(period)) for period in self.periods]
+
+        for offset in range(PLACEMENT_HORIZON_DAYS):
+            date_str = (date + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+            for period, minutes in period_minutes:
+                if minutes <= 0:
+                    continue
+
+                # Lessons have already happened on the first day of a 3:30 PM pass
+                if offset == 0 and after_school and period.kind != "after_school":
+                    continue
+
+                # Lessons are only free if there is no subject, it is a study period or it's a holiday
+                if period.kind == "lesson":
+                    subject = self.lookup_subject(subjects, date_str, period.id)
+                    if subject and subject not in STUDY_SUBJECTS:
+                        continue
+
+                used = used_minutes.get((date_str, period.id), 0)
+                if used < minutes:
+                    yield date_str, period.id, minutes - used, used == 0
+
+    # --Backlog--
+
+    def get_backlog_page(self, after_key=None, limit=BACKLOG_PAGE_SIZE, before_date=None, subject=None, exclude_period_ids=()):
+        """Get one page of incomplete tasks in date and period order, optionally only those before before_date, in a subject or not in some periods.
+        A page starts after the (date, ordinal, id) key of the last task on the previous page, so it's a short walk along idx_tasks_backlog
+        rather than skipping over every earlier task. Returns the BacklogTasks and the key of the next page, or None after the last page."""
+        conditions = ["t.completed = 0"]
+        params = []
+        if before_date:
+            conditions.append("t.date < ?")
+            params.append(before_date)
+        if exclude_period_ids:
+            conditions.append(f"t.period_id NOT IN ({", ".join("?" * len(exclude_period_ids))})")
+            params += exclude_period_ids
+
+        # Subjects depend on the date, so they are checked here rather than in the query
+        subjects = self.get_subject_lookup() if subject else None
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        tasks = []
+        key = after_key
+        while True:
+            key_condition = " AND t.date >= ? AND (t.date, p.ordinal, t.id) > (?, ?, ?)" if key else ""
+            c.execute(f"""SELECT t.id, t.task, t.date, t.period_id, p.ordinal, t.due_date, t.priority, t.effort
+                          FROM Tasks t JOIN Periods p ON p.id = t.period_id
+                          WHERE {" AND ".join(conditions)}{key_condition}
+                          ORDER BY t.date, p.ordinal, t.id LIMIT ?""", (*params, *((key[0], *key) if key else ()), limit + 1))
+            rows = [BacklogTask(*row) for row in c.fetchall()]
+
+            for task in rows:
+                key = (task.date, task.ordinal, task.id)
+                if subjects is None or self.lookup_subject(subjects, task.date, task.period_id) == subject:
+                    tasks.append(task)
+
+                    # One task more than fits shows there's a next page, which starts after the last task on this one
+                    if len(tasks) > limit:
+                        conn.close()
+                        last = tasks[limit - 1]
+                        return tasks[:limit], (last.date, last.ordinal, last.id)
+
+            if len(rows) <= limit:
+                conn.close()
+                return tasks, None
+
+    def iter_backlog(self, **filters):
+        """Yield every incomplete task matching the get_backlog_page filters, loading a page at a time."""
+        key = None
+        while True:
+            tasks, key = self.get_backlog_page(key, **filters)
+            yield from tasks
+            if key is None:
+                return
+
+    # --Move Log--
+
+    def get_task_moves(self, task_id):
+        """Get every logged move of a task, oldest first, as (moved at, from date, from period id, to date, to period id, reason)."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT moved_at, from_date, from_period_id, to_date, to_period_id, reason FROM TaskMoves WHERE task_id = ? ORDER BY id", (task_id,))
+        moves = c.fetchall()
+        conn.close()
+        return moves
+
+    def compact_move_log(self):
+        """Forget old moves of deleted tasks, and squash each remaining task's old moves into one entry from its first place to its last."""
+        cutoff = (self.clock.today() - timedelta(days=MOVE_LOG_DAYS)).strftime("%Y-%m-%d")
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("DELETE FROM TaskMoves WHERE moved_at < ? AND task_id NOT IN (SELECT id FROM Tasks)", (cutoff,))
+
+        # Keep the newest old entry of each task, widened to start where the oldest one did
+        c.execute("SELECT task_id, COUNT(*), MIN(id), MAX(id) FROM TaskMoves WHERE moved_at < ? GROUP BY task_id HAVING COUNT(*) > 1", (cutoff,))
+        for task_id, count, first_id, last_id in c.fetchall():
+            c.execute("""UPDATE TaskMoves SET
+                            from_date = (SELECT from_date FROM TaskMoves WHERE id = ?),
+                            from_period_id = (SELECT from_period_id FROM TaskMoves WHERE id = ?),
+                            reason = ?
+                        WHERE id = ?""", (first_id, first_id, f"{count} older moves combined", last_id))
+            c.execute("DELETE FROM TaskMoves WHERE task_id = ? AND moved_at < ? AND id != ?", (task_id, cutoff, last_id))
+
+        conn.commit()
+        conn.close()
+
+    # --General Functions--
+
+    def get_task_id(self, task_text, date, period_id):
+        """ Helper function to retrieve task_id for a specific task text and date."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT id FROM Tasks WHERE task=? AND date=? AND period_id=?",
+                (task_text, date.strftime("%Y-%m-%d"), period_id))
+        result = c.fetchone()
+        conn.close()
+        return result[0] if result else None
+
+    def move_task(self, task_id, date_str, period_id, reason="Moved by hand"):
+        """Helper function to move a task to a new date and period, dropping the cached weeks it moves between."""
+        self.move_tasks([(task_id, date_str, period_id)], reason)
+
+    def move_tasks(self, moves, reason):
+        """Helper function to move many tasks at once, given as (task id, date string, period id), in one transaction.
+        Each move is added to the move log in the same transaction, so the log always matches the tasks."""
+        if not moves:
+            return
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        task_ids = [task_id for task_id, _, _ in moves]
+        c.execute(f"SELECT id, date, period_id FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", task_ids)
+        old_places = {task_id: (date_str, period_id) for task_id, date_str, period_id in c.fetchall()}
+        c.executemany("UPDATE Tasks SET date = ?, period_id = ? WHERE id = ?", [(date_str, period_id, task_id) for task_id, date_str, period_id in moves])
+
+        moved_at = self.clock.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.executemany("INSERT INTO TaskMoves (task_id, from_date, from_period_id, to_date, to_period_id, reason, moved_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      [(task_id, *old_places.get(task_id, (None, None)), date_str, period_id, reason, moved_at) for task_id, date_str, period_id in moves])
+        conn.commit()
+        conn.close()
+
+        changed_dates = set(date_str for date_str, _ in old_places.values()) | set(date_str for _, date_str, _ in moves)
+        self.invalidate_dates(*changed_dates)
+        return changed_dates
+
+    def set_tasks_completed(self, task_ids, completed=True):
+        """Helper function to mark many tasks as complete (or not) in one transaction. Returns the dates which changed."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute(f"SELECT DISTINCT date FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", task_ids)
+        changed_dates = set(row[0] for row in c.fetchall())
+        c.execute(f"UPDATE Tasks SET completed = ? WHERE id IN ({", ".join("?" * len(task_ids))})", (int(completed), *task_ids))
+        conn.commit()
+        conn.close()
+        self.invalidate_dates(*changed_dates)
+        return changed_dates
+
+    def delete_tasks(self, task_ids):
+        """Helper function to delete many tasks, and their move history, in one transaction. Returns the dates which changed."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute(f"SELECT DISTINCT date FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", task_ids)
+        changed_dates = set(row[0] for row in c.fetchall())
+        c.execute(f"DELETE FROM TaskMoves WHERE task_id IN ({", ".join("?" * len(task_ids))})", task_ids)
+        c.execute(f"DELETE FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", task_ids)
+        conn.commit()
+        conn.close()
+        self.invalidate_dates(*changed_dates)
+        return changed_dates
+
+    def copy_tasks_to_next_rotation(self, task_ids):
+        """Helper function to copy tasks to the same day and period in the next week rotation (so the same subject), as new incomplete tasks.
+        Due dates move forward by the same amount. Returns the dates which changed."""
+        shift = f"+{7 * self.week_rotation_length} days"
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute(f"SELECT DISTINCT date(date, ?) FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", (shift, *task_ids))
+        changed_dates = set(row[0] for row in c.fetchall())
+        c.execute(f"""INSERT INTO Tasks (task, date, period_id, completed, due_date, priority, effort)
+                      SELECT task, date(date, ?), period_id, 0, date(due_date, ?), priority, effort FROM Tasks
+                      WHERE id IN ({", ".join("?" * len(task_ids))}) ORDER BY id""", (shift, shift, *task_ids))
+        conn.commit()
+        conn.close()
+        self.invalidate_dates(*changed_dates)
+        return changed_dates
+
+    def get_periods_of_kind(self, *kinds):
+        """Helper function to get the periods of the given kinds in order."""
+        return [period for period in self.periods if period.kind in kinds]
+
+    def get_period_capacity(self, period):
+        """Helper function to get how many tasks a period can hold, falling back on the settings."""
+        if period.capacity is not None:
+            return period.capacity
+        if period.kind == "after_school":
+            return self.settings["max_tasks_afternoon"]
+        return self.settings["max_tasks_lesson"]
+
+    def get_period_minutes(self, period):
+        """Helper function to get how many minutes of tasks a period can hold: its length if it has start and end times,
+        otherwise its task limit at the default task length."""
+        capacity = self.get_period_capacity(period)
+        if capacity <= 0:
+            return 0
+        if period.start_time and period.end_time:
+            length = datetime.strptime(period.end_time, "%H:%M") - datetime.strptime(period.start_time, "%H:%M")
+            return max(0, int(length.total_seconds() // 60))
+        return capacity * self.settings["default_task_minutes"]
+
+    def get_task_effort(self, effort):
+        """Helper function to get a task's estimated minutes, falling back on the default task length."""
+        return effort if effort else self.settings["default_task_minutes"]
+
+    def get_date_for_day(self, day, week_start_date):
+        return week_start_date + timedelta(days=DAY_ORDINALS[day])
+
+    def get_day_for_date(self, date):
+        return DAYS_OF_WEEK[date.weekday()]
+
+    def get_week_start_for_date(self, date):
+        weeks_since_start = (date - self.start_date).days // 7
+        return self.start_date + timedelta(weeks=weeks_since_start)
+
+    def get_week_number_for_date(self, date):
+        weeks_since_start = (date - self.start_date).days // 7
+        week_number = (weeks_since_start % self.week_rotation_length) + 1
+        return week_number
+
+    def get_week_title(self, week_start_date):
+        week_label = self.get_week_number_for_date(week_start_date)
+        if self.use_lettered_weeks:
+            week_label = chr(week_label + 64)
+        return f"Week {week_label} Starting {week_start_date.strftime('%Y-%m-%d')}"
+
+    def get_unique_subjects(self):
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        # Fetch unique subject names
+        c.execute("SELECT DISTINCT subject FROM Subjects")
+        unique_subjects = [row[0] for row in c.fetchall()]
+
+        conn.close()
+        return unique_subjects
+
+    def get_subject_lookup(self):
+        """Get every subject keyed by (week number, day, period id), for finding the subjects of many dates without a query each."""
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        c.execute("SELECT week, day, period_id, subject FROM Subjects")
+
+        # Weeks which aren't numbers (old lettered weeks update_db hasn't converted yet) can't match a date, so are skipped like in the grid
+        subjects = {(int(week), day, period_id): subject for week, day, period_id, subject in c.fetchall() if str(week).isdigit()}
         conn.close()
+        return subjects
+
+    def lookup_subject(self, subjects, date_str, period_id):
+        """Get the subject in a period on a date from get_subject_lookup, or None if it's free or a holiday."""
+        if self.holiday_index.is_off(date_str):
+            return None
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+        return subjects.get((self.get_week_number_for_date(date), self.get_day_for_date(date), period_id))
+
+    # Get the subject for a specific date
+    def get_subject_for_date_period(self, date, period_id):
+        day = self.get_day_for_date(date)
+        week_number = self.get_week_number_for_date(date)
+
+        if self.is_holiday(date):
+            return None
+
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+
+        c.execute("SELECT subject FROM Subjects WHERE week=? AND day=? AND period_id=?", (week_number, day, period_id))
+        subject = c.fetchone()
+        conn.close()
+        return subject[0] if subject else None
+
+    # Get the subject for a week
+    def get_subjects_for_week(self, week_start_date):
+        conn = sqlite3.connect(DATABASE_FILE)
+        c = conn.cursor()
+        week_number = self.get_week_number_for_date(week_start_date)
+
+        c.execute("SELECT day, period_id, subject FROM Subjects WHERE week=?", (week_number,))
+        subjects = c.fetchall()
+
+        conn.close()
+
+        # Remove subjects on holidays
+        subjects = [row for row in subjects if not self.holiday_index.is_off(self.get_date_for_day(row[0], week_start_date).strftime("%Y-%m-%d"))]
+        return subjects
+
+# Renders weeks of the timetable to HTML, PDF or PNG pages without a display, one week at a time
+class TimetableExporter:
+
+    FORMATS = ["html", "pdf", "png"]
+
+    # Page layout for PDF and PNG, in pixels
+    TITLE_HEIGHT = 40
+    HEADER_HEIGHT = 24
+    DAY_WIDTH = 100
+    CELL_WIDTH = 150
+    CELL_HEIGHT = 90
+    LINE_HEIGHT = 14
+
+    def __init__(self, timetable):
+        self.timetable = timetable
+
+    def export(self, export_format, first_week_date, weeks, output):
+        """Export a run of weeks starting on the week containing first_week_date. Returns the number of pages written."""
+        week_date = self.timetable.get_week_start_for_date(first_week_date)
+        week_dates = [week_date + timedelta(weeks=week) for week in range(weeks)]
+
+        if export_format == "html":
+            self.export_html(week_dates, output)
+        elif export_format == "pdf":
+            self.export_pdf(week_dates, output)
+        else:
+            self.export_png(week_dates, output)
+
+        return len(week_dates)
+
+    def get_cell_lines(self, model, day_ordinal, period_index):
+        # Subject on the first line, then one line per task
+        lines = []
+        subject = model.get_subject(day_ordinal, period_index)
+        if subject:
+            lines.append(subject)
+        for record in model.get_tasks(day_ordinal, period_index):
+            lines.append(f"[{"x" if record.completed else "!" if record.late else " "}] {record.task}")
+        return lines
+
+    # --HTML--
+
+    def export_html(self, week_dates, output):
+        with open(output, "w", encoding="utf-8") as file:
+            file.write("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>Revision Manager Timetable</title>\n")
+            file.write("<style>\n"
+                       "body { font-family: Arial, sans-serif; }\n"
+                       "section { page-break-after: always; }\n"
+                       "table { border-collapse: collapse; }\n"
+                       "th, td { border: 1px solid black; padding: 4px; width: 120px; vertical-align: top; font-size: 12px; }\n"
+                       "td.holiday { background: lightgreen; }\n"
+                       ".subject { font-weight: bold; }\n"
+                       ".completed { text-decoration: line-through; color: #666666; }\n"
+                       ".late { color: red; }\n"
+                       "</style>\n</head>\n<body>\n")
+
+            # Only one week is loaded at a time, and written out before the next
+            for week_date in week_dates:
+                file.write(self.render_html_week(week_date))
+
+            file.write("</body>\n</html>\n")
+
+    def render_html_week(self, week_date):
+        model = self.timetable.build_week_model(week_date)
+        parts = [f"<section>\n<h2>{html.escape(self.timetable.get_week_title(week_date))}</h2>\n<table>\n<tr><th>Day</th>"]
+        parts += [f"<th>{html.escape(period.label)}</th>" for period in self.timetable.periods]
+        parts.append("</tr>\n")
+
+        for day_ordinal, day in enumerate(DAYS_OF_WEEK):
+            holiday = model.holidays[day_ordinal]
+            parts.append(f"<tr><th>{day}{f"<br>{html.escape(holiday)}" if holiday else ""}</th>")
+
+            for period_index in range(model.period_count):
+                subject = model.get_subject(day_ordinal, period_index)
+                cell = [f"<div class=\"subject\">{html.escape(subject)}</div>"] if subject else []
+                for record in model.get_tasks(day_ordinal, period_index):
+                    cell.append(f"<div{" class=\"completed\"" if record.completed else " class=\"late\"" if record.late else ""}>{html.escape(record.task)}</div>")
+                parts.append(f"<td{" class=\"holiday\"" if holiday else ""}>{"".join(cell)}</td>")
+
+            parts.append("</tr>\n")
+
+        parts.append("</table>\n</section>\n")
+        return "".join(parts)
+
+    # --PDF and PNG--
+
+    def export_pdf(self, week_dates, output):
+        # All the pages go in one save, as appending rewrites every earlier page each time (Pillow keeps the rendered pages until it's written)
+        pages = (self.render_image_week(week_date) for week_date in week_dates)
+        first_page = next(pages, None)
+        if first_page is None:
+            return
+        first_page.save(output, "PDF", resolution=100, save_all=True, append_images=pages)
+
+    def export_png(self, week_dates, output):
+        os.makedirs(output, exist_ok=True)
+        for week_date in week_dates:
+            self.render_image_week(week_date).save(os.path.join(output, f"week-{week_date.strftime("%Y-%m-%d")}.png"))
+
+    def render_image_week(self, week_date):
+        # Drawing is only needed for exports, so it's imported here rather than on every start of the window
+        from PIL import ImageDraw, ImageFont
+
+        model = self.timetable.build_week_model(week_date)
+        periods = self.timetable.periods
+        width = self.DAY_WIDTH + self.CELL_WIDTH * len(periods) + 1
+        height = self.TITLE_HEIGHT + self.HEADER_HEIGHT + self.CELL_HEIGHT * len(DAYS_OF_WEEK) + 1
+
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default()
+
+        draw.text((8, 12), self.timetable.get_week_title(week_date), fill="black", font=font)
+
+        # Table headers (periods along the top)
+        top = self.TITLE_HEIGHT
+        draw.rectangle([0, top, self.DAY_WIDTH, top + self.HEADER_HEIGHT], outline="black")
+        draw.text((4, top + 6), "Day", fill="black", font=font)
+        for col, period in enumerate(periods):
+            left = self.DAY_WIDTH + col * self.CELL_WIDTH
+            draw.rectangle([left, top, left + self.CELL_WIDTH, top + self.HEADER_HEIGHT], outline="black")
+            draw.text((left + 4, top + 6), self.fit_text(draw, font, period.label), fill="black", font=font)
+
+        # Days and cells
+        for row, day in enumerate(DAYS_OF_WEEK):
+            holiday = model.holidays[row]
+            top = self.TITLE_HEIGHT + self.HEADER_HEIGHT + row * self.CELL_HEIGHT
+            fill = "lightgreen" if holiday else None
+
+            draw.rectangle([0, top, self.DAY_WIDTH, top + self.CELL_HEIGHT], outline="black", fill=fill)
+            draw.text((4, top + 4), day, fill="black", font=font)
+            if holiday:
+                draw.text((4, top + 4 + self.LINE_HEIGHT), self.fit_text(draw, font, holiday), fill="black", font=font)
+
+            for col, period in enumerate(periods):
+                left = self.DAY_WIDTH + col * self.CELL_WIDTH
+                draw.rectangle([left, top, left + self.CELL_WIDTH, top + self.CELL_HEIGHT], outline="black", fill=fill)
+
+                # Draw as many lines as fit in the cell, noting any that don't
+                lines = self.get_cell_lines(model, row, col)
+                max_lines = (self.CELL_HEIGHT - 8) // self.LINE_HEIGHT
+                if len(lines) > max_lines:
+                    lines = lines[:max_lines - 1] + [f"+{len(lines) - max_lines + 1} more"]
+                for i, line in enumerate(lines):
+                    draw.text((left + 4, top + 4 + i * self.LINE_HEIGHT), self.fit_text(draw, font, line), fill="black", font=font)
+
+        return image
+
+    def fit_text(self, draw, font, text):
+        # Shorten text with an ellipsis until it fits in a cell
+        max_width = self.CELL_WIDTH - 8
+        if draw.textlength(text, font=font) <= max_width:
+            return text
+        while text and draw.textlength(text + "...", font=font) > max_width:
+            text = text[:-1]
+        return text + "..."
 
 # Main App Class
-class RevisionManagerApp:
+class RevisionManagerApp(Timetable):
 
     # --Main Program and Timetable Management--
 
-    def __init__(self, root):
+    def __init__(self, root, clock=None, timing=False):
         self.root = root
         self.root.title("Revision Manager")
+        self.timing = timing # Report how long startup took once the first reschedule is done
+        super().__init__(clock)
         self.system_setup()
+
+        # Start auto-rescheduling once the first frame is on screen
+        self.root.bind("<Map>", self.on_first_frame)
+
+    def on_first_frame(self, event):
+        # Child widgets' Map events reach the root's bindings too, so wait for the window itself
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>")
+
+        # Run the pending redraws without handling any other events inside this handler, then reschedule once they're on screen
+        self.root.update_idletasks()
+        mark_startup("First frame")
+        self.root.after(50, self.on_first_reschedule)
+
+    def on_first_reschedule(self):
         self.schedule_auto_rescheduling()
+        mark_startup("First reschedule")
+
+        if self.timing:
+            report_startup()
 
     def system_setup(self):
         for widget in self.root.winfo_children():
             widget.destroy()
 
-        # Load settings
-        settings = SaveManager.load_settings()
-
-        # Define the start date for Week 1 and initialize variables
-        self.start_date = datetime.strptime(settings.get("start_week_date", "2024-11-18"), "%Y-%m-%d")
-        self.today_date = datetime.today()
-        self.current_week_date = self.start_date + timedelta(weeks=(self.today_date - self.start_date).days // 7)
+        # Start on the current week
+        today_date = self.clock.today()
+        self.current_week_date = self.get_week_start_for_date(today_date)
+        self.current_week_number = self.get_week_number_for_date(today_date)
 
-        # Load custom week rotation length and week display type from settings
-        self.week_rotation_length = settings.get("week_rotation_length", 2)
-        self.use_lettered_weeks = settings.get("use_lettered_weeks", False)
-        self.current_week_number = self.get_week_number_for_date(self.today_date)
+        # Subjects, tasks and holidays for the current week
+        self.week_model = None
 
-        # Store subjects and tasks
-        self.subjects = {}
-        self.tasks = {}
+        # Recently viewed weeks (rebuilt here since settings or periods may have changed)
+        self.week_cache = WeekCache()
 
         # UI elements
         self.settings_frame = tk.Frame(self.root)
@@ -192,6 +1231,7 @@ class RevisionManagerApp:
         settings_image = Image.open(os.path.join(get_assets_path(), "settings.png")).resize(size=[24, 24])
         self.settings_photoimage = ImageTk.PhotoImage(settings_image) 
         tk.Button(self.settings_frame, image=self.settings_photoimage, command=self.open_settings).pack(anchor="w")
+        tk.Button(self.settings_frame, text="Backlog", command=self.open_backlog).pack(anchor="w", pady=(5, 0))
 
         self.week_label = tk.Label(self.root, font=('Arial', 16))
         self.week_label.pack(pady=10)
@@ -211,98 +1251,115 @@ class RevisionManagerApp:
         self.nextweek_photoimage = ImageTk.PhotoImage(nextweek_image)
         tk.Button(self.navigation_frame, image=self.nextweek_photoimage, command=self.next_week).grid(row=0, column=2, padx=5)
 
+        # Loaded once here rather than on every redraw of the timetable
+        holiday_image = Image.open(os.path.join(get_assets_path(), "sleep.png")).resize(size=[15, 15])
+        self.holiday_photoimage = ImageTk.PhotoImage(holiday_image)
+
         self.timetable_frame = tk.Frame(self.root)
         self.timetable_frame.pack(pady=(0, 15), padx=15)
 
         self.show_schedule()
+        self.prefetch_neighbour_weeks()
 
     def show_schedule(self):
         # Load data from the database for the current week
         self.load_data_from_db()
 
-        week_label = self.current_week_number
-        if (SaveManager.load_settings()["use_lettered_weeks"]):
-            week_label = chr(week_label + 64)
-
         # Update the week label
-        self.week_label.config(text=f"Week {week_label} Starting {self.current_week_date.strftime('%Y-%m-%d')}")
+        self.week_label.config(text=self.get_week_title(self.current_week_date))
 
         # Clear the timetable frame
         for widget in self.timetable_frame.winfo_children():
             widget.destroy()
 
-        # Setup timetable headers
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        periods = ["1", "2", "3", "4", "5", "After School"]
-
         # Table headers (periods along the top)
-        for col, period in enumerate(["Day"] + periods):
-            tk.Label(self.timetable_frame, text=period, borderwidth=1, relief="solid", width=15).grid(row=0, column=col, sticky="nsew")
-
-        holiday_image = Image.open(os.path.join(get_assets_path(), "sleep.png")).resize(size=[15, 15])
-        self.holiday_photoimage = ImageTk.PhotoImage(holiday_image) 
+        for col, label in enumerate(["Day"] + [period.label for period in self.periods]):
+            tk.Label(self.timetable_frame, text=label, borderwidth=1, relief="solid", width=15).grid(row=0, column=col, sticky="nsew")
 
         # Days and clickable cells
-        for row, day in enumerate(days, start=1):
+        for row, day in enumerate(DAYS_OF_WEEK, start=1):
             day_frame = tk.Frame(self.timetable_frame, borderwidth=1, relief="solid", width=6, height=2)
             day_frame.grid(row=row, column=0, sticky="nsew")
 
-            # Display the name of the day
-            tk.Label(day_frame, text=day, font=('Arial italic', 10), fg="#444444").place(relx=0.5, rely=0.5, anchor="center")
+            # Display the name of the day, and the holiday it's part of
+            holiday = self.week_model.holidays[row - 1]
+            tk.Label(day_frame, text=f"{day}\n{holiday}" if holiday else day, font=('Arial italic', 10), fg="#444444").place(relx=0.5, rely=0.5, anchor="center")
 
             # Provide a button to toggle the holiday status of the day
-            this_date = self.get_date_for_day(day, self.current_week_date)
+            this_date = self.current_week_date + timedelta(days=row - 1)
 
             # Make the button green if it's a holiday already
-            button_color = "lightgreen" if self.is_holiday(this_date) else "SystemButtonFace"
+            button_color = "lightgreen" if holiday else "SystemButtonFace"
             tk.Button(day_frame, image=self.holiday_photoimage, bg=button_color, command=lambda this_date=this_date: self.toggle_date_holiday(this_date)).place(relx=0.05, rely=0.05, anchor="nw")
 
-            for col, period in enumerate(periods, start=1):
+            for col, period in enumerate(self.periods, start=1):
                 task_label = tk.Label(self.timetable_frame, borderwidth=1, relief="solid", width=15, height=5)
                 task_label.grid(row=row, column=col)
-                task_label.bind("<Button-1>", lambda event, period=period, day=day: self.open_period_options(period, day))
-                self.load_timetable_entry(task_label, day, period)
+                task_label.bind("<Button-1>", lambda event, period_id=period.id, day=day: self.open_period_options(period_id, day))
+                self.load_timetable_entry(task_label, row - 1, col - 1)
 
     def load_data_from_db(self):
-        # Clear current subjects and tasks
-        self.subjects.clear()
-        self.tasks.clear()
-
-        # Connect to the database and load subjects and tasks for the current week
+        # Use the cached week if there is one, otherwise load it from the database
+        week_key = self.current_week_date.strftime("%Y-%m-%d")
+        model = self.week_cache.get(week_key)
+        if model is None:
+            model = self.build_week_model(self.current_week_date)
+            self.week_cache.put(week_key, model)
+
+        self.week_model = model
+
+    def prefetch_neighbour_weeks(self):
+        """Build the weeks either side of the current one in the background so flicking to them is instant."""
+        week_cache = self.week_cache
+        generation = week_cache.generation
+        week_dates = [self.current_week_date - timedelta(weeks=1), self.current_week_date + timedelta(weeks=1)]
+        week_dates = [week_date for week_date in week_dates if week_date.strftime("%Y-%m-%d") not in week_cache]
+
+        def prefetch():
+            for week_date in week_dates:
+                week_cache.put(week_date.strftime("%Y-%m-%d"), self.build_week_model(week_date), generation)
+
+        if week_dates:
+            threading.Thread(target=prefetch, daemon=True).start()
+
+    def invalidate_dates(self, *dates):
+        """Drop the cached weeks containing any of the given dates (datetimes or YYYY-MM-DD strings)."""
+        week_keys = set()
+        for date in dates:
+            if isinstance(date, str):
+                date = datetime.strptime(date, "%Y-%m-%d")
+            week_keys.add(self.get_week_start_for_date(date).strftime("%Y-%m-%d"))
+
+        self.week_cache.invalidate(week_keys)
+
+    def invalidate_task_dates(self, task_ids):
+        """Drop the cached weeks containing any of the given tasks."""
         conn = sqlite3.connect(DATABASE_FILE)
         c = conn.cursor()
-
-        # Load subjects for the current week type
-        subjects = self.get_subjects_for_week(self.current_week_date)
-
-        for day, period, subject in subjects:
-            self.subjects[(self.current_week_number, day, period)] = subject
-
-        # Load tasks that are date-specific
-        c.execute("SELECT id, task, date, period, completed FROM Tasks")
-        tasks = c.fetchall()
-
-        for task_id, task, date_str, period, completed in tasks:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
-            if (date, period) not in self.tasks:
-                self.tasks[(date, period)] = []
-            self.tasks[(date, period)].append((task_id, task, completed))  # Store task with its completed status
-
+        c.execute(f"SELECT DISTINCT date FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", list(task_ids))
+        dates = [row[0] for row in c.fetchall()]
         conn.close()
+        self.invalidate_dates(*dates)
 
-    def load_timetable_entry(self, task_label, day, period):
-        # Get date of current day in week
-        date = self.get_date_for_day(day, self.current_week_date)
+    def refresh_changed_dates(self, dates):
+        """Redraw the timetable after a batch change, but only if one of the changed dates is in the week on screen."""
+        week_end_date = (self.current_week_date + timedelta(days=6)).strftime("%Y-%m-%d")
+        if any(self.current_week_date.strftime("%Y-%m-%d") <= date_str <= week_end_date for date_str in dates):
+            self.show_schedule()
 
+    def load_timetable_entry(self, task_label, day_ordinal, period_index):
         # Retrieve subject and tasks for this specific day and period
-        subject = self.subjects.get((self.current_week_number, day, period))
-        tasks = self.tasks.get((date, period), [])  # date-specific task storage
+        subject = self.week_model.get_subject(day_ordinal, period_index)
+        tasks = self.week_model.get_tasks(day_ordinal, period_index)
 
         # Assume no subjects or tasks
         task_label.config(text="", font=('Arial', 10))
 
-        # Configure text based on subject and tasks
+        # Configure text based on subject and tasks, flagging any which will miss their due date
         tasks_text = f"{str(len(tasks))} task{"s" if len(tasks) > 1 else ""}"
+        late_count = sum(1 for record in tasks if record.late)
+        if late_count:
+            tasks_text += f" ({late_count} late)"
 
         if subject:
             task_label.config(text=subject)
@@ -311,6 +1368,25 @@ class RevisionManagerApp:
         elif tasks:
             task_label.config(text=tasks_text)
 
+    def handle_instance_requests(self, requests):
+        # Act on every request handed over from later launches of the app
+        while True:
+            try:
+                request = requests.get_nowait()
+            except queue.Empty:
+                return
+
+            if request.get("command") == "show":
+                self.raise_window()
+
+    def raise_window(self):
+        # Bring the window to the front, even if it was minimised
+        self.root.deiconify()
+        self.root.lift()
+        self.root.attributes("-topmost", True)
+        self.root.after_idle(self.root.attributes, "-topmost", False)
+        self.root.focus_force()
+
     # --Week Navigation--
 
     def prev_week(self):
@@ -318,32 +1394,128 @@ class RevisionManagerApp:
         self.current_week_date -= timedelta(weeks=1)
         self.current_week_number = self.get_week_number_for_date(self.current_week_date)
         self.show_schedule()
+        self.prefetch_neighbour_weeks()
 
     def next_week(self):
         # Navigate to the next week
         self.current_week_date += timedelta(weeks=1)
         self.current_week_number = self.get_week_number_for_date(self.current_week_date)
         self.show_schedule()
+        self.prefetch_neighbour_weeks()
 
     def go_to_current_week(self):
         # Reset to the current week
-        self.current_week_date = self.start_date + timedelta(weeks=(self.today_date - self.start_date).days // 7)
-        self.current_week_number = self.get_week_number_for_date(self.today_date)
+        self.go_to_date(self.clock.today())
+
+    def go_to_date(self, date):
+        # Show the week containing a date
+        self.current_week_date = self.get_week_start_for_date(date)
+        self.current_week_number = self.get_week_number_for_date(date)
         self.show_schedule()
+        self.prefetch_neighbour_weeks()
+
+    # --Backlog--
+
+    def open_backlog(self):
+        backlog_window = tk.Toplevel(self.root, padx=10, pady=10)
+        backlog_window.title("Backlog")
+
+        # Filters
+        filters_frame = tk.Frame(backlog_window)
+        filters_frame.pack(anchor="w")
+
+        tk.Label(filters_frame, text="Subject:").grid(row=0, column=0)
+        subject_var = tk.StringVar(value="All subjects")
+        subject_dropdown = ttk.Combobox(filters_frame, textvariable=subject_var, values=["All subjects"] + sorted(self.get_unique_subjects()), state="readonly")
+        subject_dropdown.grid(row=0, column=1, padx=5)
+
+        overdue_only = tk.BooleanVar(value=False)
+        tk.Checkbutton(filters_frame, text="Overdue only", variable=overdue_only, command=lambda: first_page()).grid(row=0, column=2)
+
+        # Tasks, with overdue and late ones in red
+        columns = {"date": "Date", "period": "Period", "subject": "Subject", "task": "Task", "due": "Due"}
+        tasks_tree = ttk.Treeview(backlog_window, columns=list(columns), show="headings", height=20)
+        for column, heading in columns.items():
+            tasks_tree.heading(column, text=heading)
+            tasks_tree.column(column, width=240 if column == "task" else 100)
+        tasks_tree.tag_configure("overdue", foreground="red")
+        tasks_tree.pack(pady=10)
+
+        # Double click a task to go to its period
+        def open_task(event):
+            selected = tasks_tree.focus()
+            if selected:
+                date_str, period_id = shown_tasks[selected]
+                date = datetime.strptime(date_str, "%Y-%m-%d")
+                self.go_to_date(date)
+                self.open_period_options(period_id, self.get_day_for_date(date))
+        tasks_tree.bind("<Double-1>", open_task)
+
+        pages_frame = tk.Frame(backlog_window)
+        pages_frame.pack()
+        prev_button = tk.Button(pages_frame, text="Previous", command=lambda: prev_page())
+        prev_button.grid(row=0, column=0)
+        page_label = tk.Label(pages_frame)
+        page_label.grid(row=0, column=1, padx=10)
+        next_button = tk.Button(pages_frame, text="Next", command=lambda: next_page())
+        next_button.grid(row=0, column=2)
+
+        page_keys = [None] # Key each viewed page starts after, so Previous can go back
+        next_key = [None]
+        shown_tasks = {} # Tree row id to (date, period id)
+
+        def show_page():
+            today_date = self.clock.today().strftime("%Y-%m-%d")
+            subject = None if subject_var.get() == "All subjects" else subject_var.get()
+            tasks, next_key[0] = self.get_backlog_page(page_keys[-1], before_date=today_date if overdue_only.get() else None, subject=subject)
+
+            tasks_tree.delete(*tasks_tree.get_children())
+            shown_tasks.clear()
+            subjects = self.get_subject_lookup()
+            for task in tasks:
+                overdue = task.date < today_date or (task.due_date and task.date > task.due_date)
+                values = (task.date, self.period_lookup[task.period_id].label, self.lookup_subject(subjects, task.date, task.period_id) or "Free", task.task, task.due_date or "")
+                tasks_tree.insert("", "end", iid=str(task.id), values=values, tags=("overdue",) if overdue else ())
+                shown_tasks[str(task.id)] = (task.date, task.period_id)
+
+            page_label.config(text=f"Page {len(page_keys)}" if tasks else "No tasks")
+            prev_button.config(state="normal" if len(page_keys) > 1 else "disabled")
+            next_button.config(state="normal" if next_key[0] else "disabled")
+
+        def first_page():
+            del page_keys[1:]
+            show_page()
+
+        def next_page():
+            page_keys.append(next_key[0])
+            show_page()
+
+        def prev_page():
+            page_keys.pop()
+            show_page()
+
+        # Buttons for the selected tasks (shift or ctrl click to select more than one)
+        batch_frame = tk.Frame(backlog_window)
+        batch_frame.pack(pady=(10, 0))
+        self.create_batch_buttons(batch_frame, backlog_window, lambda: [int(task_id) for task_id in tasks_tree.selection()], show_page)
+
+        subject_dropdown.bind("<<ComboboxSelected>>", lambda event: first_page())
+        show_page()
 
     # --Period Options--
 
-    def open_period_options(self, period, day):
+    def open_period_options(self, period_id, day):
         options_window = tk.Toplevel(self.root, padx=10, pady=10)
-        options_window.title(f"Options for {day} Period {period}")
-        self.show_period_options(period, day, options_window)
+        options_window.title(f"Options for {day} Period {self.period_lookup[period_id].label}")
+        self.show_period_options(period_id, day, options_window)
 
-    def show_period_options(self, period, day, options_window):
+    def show_period_options(self, period_id, day, options_window):
         for widget in options_window.winfo_children():
             widget.destroy()
 
-        date = self.get_date_for_day(day, self.current_week_date)
-        tasks = self.tasks.get((date, period), [])
+        day_ordinal = DAY_ORDINALS[day]
+        period_index = self.period_index[period_id]
+        tasks = self.week_model.get_tasks(day_ordinal, period_index)
 
         subject_frame = tk.Frame(options_window)
         subject_frame.pack(anchor="w")
@@ -352,15 +1524,15 @@ class RevisionManagerApp:
         subject_label = tk.Label(subject_frame, text="Subject:", pady=10)
         subject_label.grid(row=0, column=0)
 
-        subject = self.subjects.get((self.current_week_number, day, period))
+        subject = self.week_model.get_subject(day_ordinal, period_index)
         subject_text = tk.Label(subject_frame, text=subject if subject else "Free")
         subject_text.grid(row=0, column=1, sticky="w")
 
         # Buttons for subject management
         if subject:
-            tk.Button(subject_frame, text="Remove Subject", command=lambda: self.remove_subject(period, day, options_window)).grid(row=0, column=2)
+            tk.Button(subject_frame, text="Remove Subject", command=lambda: self.remove_subject(period_id, day, options_window)).grid(row=0, column=2)
         else:
-            tk.Button(subject_frame, text="Set Subject", command=lambda: self.set_subject(period, day, options_window)).grid(row=0, column=2)
+            tk.Button(subject_frame, text="Set Subject", command=lambda: self.set_subject(period_id, day, options_window)).grid(row=0, column=2)
 
         separatora = ttk.Separator(options_window, orient="horizontal")
         separatora.pack(fill="x", pady=5)
@@ -376,30 +1548,42 @@ class RevisionManagerApp:
             complete_label = tk.Label(tasks_frame, text="Complete:")
             complete_label.grid(row=2, column=2, sticky="w")
 
-            # Show tasks
-            for i, (task_id, task, completed) in enumerate(tasks):
-                number_label = tk.Label(tasks_frame, text=str(i + 1))
-                number_label.grid(row=3+i, column=0)
+            # Show tasks, each with a numbered checkbox to select it for the batch buttons
+            selected = {}
+            for i, record in enumerate(tasks):
+                selected[record.id] = tk.BooleanVar(value=False)
+                tk.Checkbutton(tasks_frame, text=str(i + 1), variable=selected[record.id]).grid(row=3+i, column=0, sticky="w")
 
                 task_frame = tk.Frame(tasks_frame)
                 task_frame.grid(row=3+i, column=1)
 
-                task_label = tk.Label(tasks_frame, text=task, anchor="w", justify="left")
+                # Show the due date, length and priority under the task, in red if it will miss its due date
+                details = []
+                if record.due_date:
+                    details.append(f"Due {record.due_date}")
+                details.append(f"{self.get_task_effort(record.effort)} min")
+                if record.priority is not None and record.priority != DEFAULT_PRIORITY:
+                    details.append(f"{PRIORITIES[record.priority]} priority")
+
+                task_label = tk.Label(tasks_frame, text=f"{record.task}\n{", ".join(details)}", anchor="w", justify="left", fg="red" if record.late else "black")
                 task_label.grid(row=3+i, column=1, sticky="w")
 
                 # Add checkbox to mark task as completed
-                completed_var = tk.BooleanVar(value=completed)
-                complete_checkbox = tk.Checkbutton(tasks_frame, variable=completed_var, command=lambda tid=task_id, var=completed_var: self.toggle_task_completion(tid, var))
+                completed_var = tk.BooleanVar(value=record.completed)
+                complete_checkbox = tk.Checkbutton(tasks_frame, variable=completed_var, command=lambda tid=record.id, var=completed_var: self.toggle_task_completion(tid, var))
                 complete_checkbox.grid(row=3+i, column=2)
 
                 # Add a reschedule button for each task
-                tk.Button(tasks_frame, text=f"Reschedule", command=lambda tid=task_id: self.reschedule_task(tid, period, day, options_window)).grid(row=3 + i, column=3)
+                tk.Button(tasks_frame, text=f"Reschedule", command=lambda tid=record.id: self.reschedule_task(tid, period_id, day, options_window)).grid(row=3 + i, column=3)
 
-                # Add a rename button for each task
-                tk.Button(tasks_frame, text=f"Rename", command=lambda tid=task_id: self.rename_task(tid, period, day, options_window)).grid(row=3 + i, column=4)
+                # Add an edit button for each task
+                tk.Button(tasks_frame, text=f"Edit", command=lambda rec=record: self.edit_task(rec, period_id, day, options_window)).grid(row=3 + i, column=4)
 
                 # Add a remove button for each task
-                tk.Button(tasks_frame, text=f"Remove", command=lambda tid=task_id: self.remove_task(tid, period, day, options_window)).grid(row=3 + i, column=5)
+                tk.Button(tasks_frame, text=f"Remove", command=lambda tid=record.id: self.remove_task(tid, period_id, day, options_window)).grid(row=3 + i, column=5)
+
+                # Add a history button for each task
+                tk.Button(tasks_frame, text=f"History", command=lambda rec=record: self.show_task_history(rec)).grid(row=3 + i, column=6)
         else:
             no_label = tk.Label(tasks_frame, text = "No tasks")
             no_label.grid(row=2, column=0, sticky="w")
@@ -408,44 +1592,34 @@ class RevisionManagerApp:
         tasks_management_frame = tk.Frame(options_window)
         tasks_management_frame.pack(anchor="w")
 
-        tk.Button(tasks_management_frame, text="Add Task", command=lambda: self.add_task(period, day, options_window)).grid(row=0, column=0)
+        tk.Button(tasks_management_frame, text="Add Task", command=lambda: self.add_task(period_id, day, options_window)).grid(row=0, column=0)
         if tasks:
-            tk.Button(tasks_management_frame, text="Clear Tasks", command=lambda: self.clear_tasks(period, day, options_window)).grid(row=0, column=1)
+            tk.Button(tasks_management_frame, text="Clear Tasks", command=lambda: self.clear_tasks(period_id, day, options_window)).grid(row=0, column=1)
 
-    # --Holiday Management--
-    def is_holiday(self, date):
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        c.execute("SELECT * FROM Holidays WHERE date=?", (date.strftime("%Y-%m-%d"),))
-        result = c.fetchone()
-        conn.close()
-        return result
+            # Buttons for the selected tasks
+            def select_all():
+                select = not all(var.get() for var in selected.values())
+                for var in selected.values():
+                    var.set(select)
+
+            batch_frame = tk.Frame(options_window)
+            batch_frame.pack(anchor="w", pady=(5, 0))
+            tk.Button(batch_frame, text="Select All", command=select_all).grid(row=0, column=0)
+            self.create_batch_buttons(batch_frame, options_window,
+                                      lambda: [task_id for task_id, var in selected.items() if var.get()],
+                                      lambda: self.show_period_options(period_id, day, options_window), first_column=1)
 
+    # --Holiday Management--
     def toggle_date_holiday(self, date):
         if self.is_holiday(date):
-            self.remove_date_from_holidays(date)
+            self.set_holiday_range(date, date, None)
         else:
-            self.add_date_to_holidays(date)
-
-    def add_date_to_holidays(self, date):
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        c.execute("INSERT INTO Holidays (date) VALUES (?)", (date.strftime("%Y-%m-%d"),))
-        conn.commit()
-        conn.close()
-        self.show_schedule()
-
-    def remove_date_from_holidays(self, date):
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        c.execute("DELETE FROM Holidays WHERE date=?", (date.strftime("%Y-%m-%d"),))
-        conn.commit()
-        conn.close()
+            self.set_holiday_range(date, date)
         self.show_schedule()
 
     # --Subject Management--
 
-    def set_subject(self, period, day, options_window):
+    def set_subject(self, period_id, day, options_window):
         # Set or replace the subject for the selected period
         set_subject_window = tk.Toplevel(self.root)
         set_subject_window.title("Set Subject")
@@ -458,32 +1632,34 @@ class RevisionManagerApp:
             subject_text = subject_var.get()
             conn = sqlite3.connect(DATABASE_FILE)
             c = conn.cursor()
-            c.execute("DELETE FROM Subjects WHERE week=? AND day=? AND period=?", 
-                      (self.current_week_number, day, period))
-            c.execute("INSERT INTO Subjects (week, day, period, subject) VALUES (?, ?, ?, ?)", 
-                      (self.current_week_number, day, period, subject_text))
+            c.execute("DELETE FROM Subjects WHERE week=? AND day=? AND period_id=?", 
+                      (self.current_week_number, day, period_id))
+            c.execute("INSERT INTO Subjects (week, day, period_id, subject) VALUES (?, ?, ?, ?)", 
+                      (self.current_week_number, day, period_id, subject_text))
             conn.commit()
             conn.close()
+            self.week_cache.invalidate_week_number(self.current_week_number)
             self.show_schedule()
-            self.show_period_options(period, day, options_window)
+            self.show_period_options(period_id, day, options_window)
             set_subject_window.destroy()
 
         tk.Button(set_subject_window, text="Save Subject", command=save_subject).grid(row=1, column=0, columnspan=2, pady=5)
 
-    def remove_subject(self, period, day, options_window):
+    def remove_subject(self, period_id, day, options_window):
         # Remove the subject from the selected period
         conn = sqlite3.connect(DATABASE_FILE)
         c = conn.cursor()
-        c.execute("DELETE FROM Subjects WHERE week=? AND day=? AND period=? AND subject IS NOT NULL", 
-                  (self.current_week_number, day, period))
+        c.execute("DELETE FROM Subjects WHERE week=? AND day=? AND period_id=? AND subject IS NOT NULL", 
+                  (self.current_week_number, day, period_id))
         conn.commit()
         conn.close()
+        self.week_cache.invalidate_week_number(self.current_week_number)
         self.show_schedule()
-        self.show_period_options(period, day, options_window)
+        self.show_period_options(period_id, day, options_window)
 
     # --Tasks Management
 
-    def add_task(self, period, day, options_window):
+    def add_task(self, period_id, day, options_window):
         add_task_window = tk.Toplevel(self.root)
         add_task_window.title("Add Task")
 
@@ -491,46 +1667,92 @@ class RevisionManagerApp:
         task_var = tk.StringVar()
         tk.Entry(add_task_window, textvariable=task_var).grid(row=0, column=1)
 
+        detail_vars = self.create_task_detail_fields(add_task_window)
+
         def save_task():
             task_text = task_var.get()
             date_str = self.get_date_for_day(day, self.current_week_date).strftime("%Y-%m-%d")
 
+            details = self.read_task_detail_fields(detail_vars, add_task_window)
+            if details is None:
+                return
+
             # Retrieve subject ID for the specific period and day
             conn = sqlite3.connect(DATABASE_FILE)
             c = conn.cursor()
 
             # Insert task into the Tasks table with subject_id
-            c.execute("INSERT INTO Tasks (task, date, period, completed) VALUES (?, ?, ?, ?)",
-                    (task_text, date_str, period, 0))
+            c.execute("INSERT INTO Tasks (task, date, period_id, completed, due_date, priority, effort) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (task_text, date_str, period_id, 0, *details))
             conn.commit()
 
             conn.close()
+            self.invalidate_dates(date_str)
             self.show_schedule()
-            self.show_period_options(period, day, options_window)
+            self.show_period_options(period_id, day, options_window)
             add_task_window.destroy()
 
-        tk.Button(add_task_window, text="Save Task", command=save_task).grid(row=1, column=0, columnspan=2)
+        tk.Button(add_task_window, text="Save Task", command=save_task).grid(row=4, column=0, columnspan=2)
+
+    def create_task_detail_fields(self, window, record=None):
+        # Due date, priority and estimated length fields for the add and edit task windows, in rows 1 to 3
+        due_var = tk.StringVar(value=(record.due_date or "") if record else "")
+        tk.Label(window, text="Due date (YYYY-MM-DD):").grid(row=1, column=0, sticky="e")
+        tk.Entry(window, textvariable=due_var).grid(row=1, column=1)
+
+        priority_var = tk.StringVar(value=PRIORITIES[record.priority if record and record.priority is not None else DEFAULT_PRIORITY])
+        tk.Label(window, text="Priority:").grid(row=2, column=0, sticky="e")
+        ttk.Combobox(window, textvariable=priority_var, values=PRIORITIES, state="readonly").grid(row=2, column=1)
+
+        effort_var = tk.StringVar(value=str(record.effort) if record and record.effort else "")
+        tk.Label(window, text=f"Minutes (default {self.settings["default_task_minutes"]}):").grid(row=3, column=0, sticky="e")
+        tk.Entry(window, textvariable=effort_var).grid(row=3, column=1)
+
+        return due_var, priority_var, effort_var
 
-    def clear_tasks(self, period, day, options_window):
+    def read_task_detail_fields(self, detail_vars, window):
+        # Check the detail fields, returning (due date, priority, effort) or None if they aren't valid
+        due_var, priority_var, effort_var = detail_vars
+
+        due_date = due_var.get().strip() or None
+        if due_date:
+            try:
+                due_date = datetime.strptime(due_date, "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Invalid Task", "The due date must be in the form YYYY-MM-DD.", parent=window)
+                return None
+
+        effort = effort_var.get().strip()
+        if effort and (not effort.isdigit() or int(effort) == 0):
+            messagebox.showerror("Invalid Task", "The length must be a whole number of minutes.", parent=window)
+            return None
+
+        return due_date, PRIORITIES.index(priority_var.get()), int(effort) if effort else None
+
+    def clear_tasks(self, period_id, day, options_window):
         # Clear all tasks from the selected period
         date_str = self.get_date_for_day(day, self.current_week_date).strftime("%Y-%m-%d")
         conn = sqlite3.connect(DATABASE_FILE)
         c = conn.cursor()
-        c.execute("DELETE FROM Tasks WHERE date=? AND period=? AND task IS NOT NULL", 
-                  (date_str, period))
+        c.execute("DELETE FROM TaskMoves WHERE task_id IN (SELECT id FROM Tasks WHERE date=? AND period_id=? AND task IS NOT NULL)", (date_str, period_id))
+        c.execute("DELETE FROM Tasks WHERE date=? AND period_id=? AND task IS NOT NULL", 
+                  (date_str, period_id))
         conn.commit()
         conn.close()
+        self.invalidate_dates(date_str)
         self.show_schedule()
-        self.show_period_options(period, day, options_window)
+        self.show_period_options(period_id, day, options_window)
 
-    def remove_task(self, task_id, period, day, options_window):
+    def remove_task(self, task_id, period_id, day, options_window):
+        self.invalidate_task_dates([task_id])
         conn = sqlite3.connect(DATABASE_FILE)
         c = conn.cursor()
+        c.execute("DELETE FROM TaskMoves WHERE task_id=?", (task_id,))
         c.execute("DELETE FROM Tasks WHERE id=? AND task IS NOT NULL", [(task_id)])
         conn.commit()
         conn.close()
         self.show_schedule()
-        self.show_period_options(period, day, options_window)
+        self.show_period_options(period_id, day, options_window)
 
     def toggle_task_completion(self, task_id, completed_var):
         new_status = 1 if completed_var.get() else 0
@@ -539,186 +1761,174 @@ class RevisionManagerApp:
         c.execute("UPDATE Tasks SET completed=? WHERE id=?", (new_status, task_id))
         conn.commit()
         conn.close()
+        self.invalidate_task_dates([task_id])
         self.show_schedule()
 
-    def reschedule_task(self, task_id, period, day, options_window):
-        # Create the rescheduling window
-        reschedule_window = tk.Toplevel(self.root)
-        reschedule_window.title("Reschedule Task")
+    def reschedule_task(self, task_id, period_id, day, options_window):
+        def save_reschedule(new_date, new_period):
+            # Update the task's date and period in the database
+            self.move_task(task_id, new_date, new_period)
+            self.show_schedule()
+            self.show_period_options(period_id, day, options_window)
+
+        self.open_move_window("Reschedule Task", save_reschedule)
+
+    def open_move_window(self, title, on_save):
+        # Ask for a new date and period, then pass them to on_save as a date string and period id
+        move_window = tk.Toplevel(self.root)
+        move_window.title(title)
 
-        # Date selection using tkcalendar DateEntry
-        tk.Label(reschedule_window, text="New Date:").grid(row=0, column=0, padx=5, pady=5)
-        date_entry = DateEntry(reschedule_window, width=12, background='darkblue',
+        # Date selection using tkcalendar DateEntry (imported here so it only loads when needed)
+        from tkcalendar import DateEntry
+        tk.Label(move_window, text="New Date:").grid(row=0, column=0, padx=5, pady=5)
+        date_entry = DateEntry(move_window, width=12, background='darkblue',
                                foreground='white', borderwidth=2, date_pattern='y-mm-dd')
         date_entry.grid(row=0, column=1, padx=5, pady=5)
 
         # Period selection using a dropdown menu
-        tk.Label(reschedule_window, text="New Period:").grid(row=1, column=0, padx=5, pady=5)
-        period_options = ["1", "2", "3", "4", "5", "After School"]
-        period_var = tk.StringVar(value="1")
-        period_dropdown = ttk.Combobox(reschedule_window, textvariable=period_var, values=period_options, state="readonly")
+        tk.Label(move_window, text="New Period:").grid(row=1, column=0, padx=5, pady=5)
+        period_options = [period.label for period in self.periods]
+        period_var = tk.StringVar(value=period_options[0])
+        period_dropdown = ttk.Combobox(move_window, textvariable=period_var, values=period_options, state="readonly")
         period_dropdown.grid(row=1, column=1, padx=5, pady=5)
 
-        # Save button to update the task in the database
-        def save_reschedule():
-            new_date = date_entry.get_date()
-            new_period = period_var.get()
-
-            conn = sqlite3.connect(DATABASE_FILE)
-            c = conn.cursor()
-
-            # Update the task's date and period in the database
-            c.execute("UPDATE Tasks SET date = ?, period = ? WHERE id = ?", (new_date, new_period, task_id))
-            conn.commit()
-            reschedule_window.destroy()
-            self.show_schedule()
-            self.show_period_options(period, day, options_window)
+        def save_move():
+            new_date = date_entry.get_date().strftime("%Y-%m-%d")
+            new_period = self.periods[period_dropdown.current()].id
+            move_window.destroy()
+            on_save(new_date, new_period)
 
-        save_button = tk.Button(reschedule_window, text="Save", command=save_reschedule)
+        save_button = tk.Button(move_window, text="Save", command=save_move)
         save_button.grid(row=2, column=0, columnspan=2, pady=10)
 
-    def rename_task(self, task_id, period, day, options_window):
-        # Create the rescheduling window
-        rename_window = tk.Toplevel(self.root)
-        rename_window.title("Rename Task")
-
-        # Date selection using tkcalendar DateEntry
-        tk.Label(rename_window, text="New Name:").grid(row=0, column=0, padx=5, pady=5)
-        name_var = tk.StringVar()
-        tk.Entry(rename_window, textvariable=name_var).grid(row=0, column=1, padx=5, pady=5)
+    def create_batch_buttons(self, frame, window, get_selected, refresh_window, first_column=0):
+        # Complete, move, copy and delete buttons acting on the tasks get_selected returns.
+        # Each batch is one transaction, then one redraw of the timetable (if the week on screen changed) and of the window
+        def run_batch(action):
+            task_ids = get_selected()
+            if not task_ids:
+                messagebox.showinfo("No Tasks Selected", "Select some tasks first.", parent=window)
+                return
+            changed_dates = action(task_ids)
+            if changed_dates is not None:
+                self.refresh_changed_dates(changed_dates)
+                refresh_window()
+
+        def move_selected(task_ids):
+            def save_move(new_date, new_period):
+                self.refresh_changed_dates(self.move_tasks([(task_id, new_date, new_period) for task_id in task_ids], "Moved by hand"))
+                refresh_window()
+
+            self.open_move_window(f"Move {len(task_ids)} Task{"s" if len(task_ids) > 1 else ""}", save_move)
+
+        def delete_selected(task_ids):
+            if messagebox.askyesno("Delete Tasks", f"Delete {len(task_ids)} task{"s" if len(task_ids) > 1 else ""}?", parent=window):
+                return self.delete_tasks(task_ids)
+
+        buttons = [
+            ("Complete", self.set_tasks_completed),
+            ("Move...", move_selected),
+            ("Copy to Next Rotation", self.copy_tasks_to_next_rotation),
+            ("Delete", delete_selected)
+        ]
+        tk.Label(frame, text="Selected:").grid(row=0, column=first_column, padx=(10, 0))
+        for column, (text, action) in enumerate(buttons, start=first_column + 1):
+            tk.Button(frame, text=text, command=lambda action=action: run_batch(action)).grid(row=0, column=column)
+
+    def show_task_history(self, record):
+        # Show every logged move of a task, oldest first
+        history_window = tk.Toplevel(self.root, padx=10, pady=10)
+        history_window.title(f"History: {record.task}")
+
+        moves = self.get_task_moves(record.id)
+        if not moves:
+            tk.Label(history_window, text="This task hasn't been moved").grid(row=0, column=0)
+            return
+
+        for column, heading in enumerate(["When", "From", "To", "Reason"]):
+            tk.Label(history_window, text=heading, font=("Arial", 10, "bold")).grid(row=0, column=column, sticky="w", padx=5)
+
+        def describe_place(date_str, period_id):
+            period = self.period_lookup.get(period_id)
+            return f"{date_str or "?"} {period.label if period else "(removed period)"}"
+
+        for row, (moved_at, from_date, from_period_id, to_date, to_period_id, reason) in enumerate(moves, start=1):
+            tk.Label(history_window, text=moved_at).grid(row=row, column=0, sticky="w", padx=5)
+            tk.Label(history_window, text=describe_place(from_date, from_period_id)).grid(row=row, column=1, sticky="w", padx=5)
+            tk.Label(history_window, text=describe_place(to_date, to_period_id)).grid(row=row, column=2, sticky="w", padx=5)
+            tk.Label(history_window, text=reason).grid(row=row, column=3, sticky="w", padx=5)
+
+    def edit_task(self, record, period_id, day, options_window):
+        # Create the editing window
+        edit_window = tk.Toplevel(self.root)
+        edit_window.title("Edit Task")
+
+        tk.Label(edit_window, text="Name:").grid(row=0, column=0, padx=5, pady=5)
+        name_var = tk.StringVar(value=record.task)
+        tk.Entry(edit_window, textvariable=name_var).grid(row=0, column=1, padx=5, pady=5)
+
+        detail_vars = self.create_task_detail_fields(edit_window, record)
 
         # Save button to update the task in the database
-        def save_rename():
-            new_name = name_var.get()
+        def save_edit():
+            details = self.read_task_detail_fields(detail_vars, edit_window)
+            if details is None:
+                return
 
             conn = sqlite3.connect(DATABASE_FILE)
             c = conn.cursor()
 
-            # Update the task's date and period in the database
-            c.execute("UPDATE Tasks SET task = ? WHERE id = ?", (new_name, task_id))
+            # Update the task's name and details in the database
+            c.execute("UPDATE Tasks SET task = ?, due_date = ?, priority = ?, effort = ? WHERE id = ?", (name_var.get(), *details, record.id))
             conn.commit()
-            rename_window.destroy()
+            conn.close()
+            self.invalidate_task_dates([record.id])
+            edit_window.destroy()
             self.show_schedule()
-            self.show_period_options(period, day, options_window)
+            self.show_period_options(period_id, day, options_window)
 
-        save_button = tk.Button(rename_window, text="Save", command=save_rename)
-        save_button.grid(row=1, column=0, columnspan=2, pady=10)
+        save_button = tk.Button(edit_window, text="Save", command=save_edit)
+        save_button.grid(row=4, column=0, columnspan=2, pady=10)
 
     # --Auto Rescheduling--
 
     def auto_reschedule_tasks(self):
-        """Automate rescheduling tasks at 3:00 PM and midnight."""
-
-        # Only perform reschedule if auto-rescheduling is enabled
-        if SaveManager.load_settings()["auto_reschedule"] == True:
-            now = datetime.now()
-            self.clear_old_completed_tasks()  # Clear old completed tasks first
-            if now.hour >= 16:
-                # 3:30 PM rescheduling
-                self.reschedule_incomplete_tasks_to_afternoon(datetime.today())
-            else:
-                # Midnight rescheduling for the next day
-                self.reschedule_incomplete_tasks_to_next_day(datetime.today())
-
-            self.show_schedule()
-
-        # Schedule this function to check every minute for trigger times
-        self.root.after(60000, self.auto_reschedule_tasks)
-
-    def schedule_auto_rescheduling(self):
-        # Start the auto-rescheduling check
-        self.auto_reschedule_tasks()
-
-    def clear_old_completed_tasks(self):
-        """Remove all completed tasks from the database if they are from a previous week."""
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        cutoff_date = self.today_date - timedelta(days=self.today_date.weekday())  # Start of current week
-        c.execute("DELETE FROM Tasks WHERE completed = 1 AND date < ?", (cutoff_date.strftime("%Y-%m-%d"),))
-        conn.commit()
-        conn.close()
-
-    def reschedule_incomplete_tasks_to_afternoon(self, date):
-        """Move incomplete tasks to 'After School' at 3:30 PM and redistribute if necessary."""
-        today_date = date.strftime("%Y-%m-%d")
-
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-
-        # Get all incomplete tasks for the current day that aren't in "After School"
-        c.execute("SELECT id, task FROM Tasks WHERE date < ? AND period != 'After School' AND completed = 0", (today_date,))
-        tasks = c.fetchall()
-        conn.close()
-
-        # Move tasks to "After School" initially
-        for task_id, task in tasks:
-            self.reschedule_task_to_afternoon(task_id, date)
-
-    def reschedule_incomplete_tasks_to_next_day(self, date):
-        """Move today's incomplete tasks to tomorrow's available periods."""
-        today_date = date.strftime("%Y-%m-%d")
-
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
+        """Automate rescheduling tasks at the end of the school day and midnight, running a pass if one of them has passed since the last pass."""
+        now = self.clock.now()
 
-        # Get all incomplete tasks from yesterday
-        c.execute("SELECT id FROM Tasks WHERE date < ? AND completed = 0", (today_date,))
-        tasks = c.fetchall()
-        conn.close()
-
-        # Attempt to reschedule these tasks to the next day
-        for task_id, in tasks:
-            self.redistribute_task_to_next_available_period(task_id, date)
-
-    def reschedule_task_to_afternoon(self, task_id, date):
-        today_date = date.strftime("%Y-%m-%d")
-        tomorrow_date = date + timedelta(days=1)
-
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-
-        # Get the maximum number of tasks which can be rescheduled for after school
-        max_tasks = SaveManager.load_settings()["max_tasks_afternoon"]
-
-        # If under the limit
-        if self.count_tasks_in_period(today_date, 'After School') < max_tasks:
-            # Reschedule task to afternoon
-            c.execute("UPDATE Tasks SET period = 'After School', date = ? WHERE id = ?", (today_date, task_id,))
-            conn.commit()
-            conn.close()
-
-        # Else reschedule to next day
-        else:
-            conn.close()
-            self.redistribute_task_to_next_available_period(task_id, tomorrow_date)
+        # The clock went backwards (changed by hand, or a time zone change), so count from now instead
+        if now < self.last_reschedule_time:
+            self.last_reschedule_time = now
 
-    def redistribute_task_to_next_available_period(self, task_id, date):
-        """Find the next available period for a task on the target date and reschedule it."""
-        today_date = date.strftime("%Y-%m-%d")
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
+        # One pass catches up on however many trigger times were missed while the machine was asleep
+        if now >= self.get_next_reschedule_time(self.last_reschedule_time):
+            self.last_reschedule_time = now
 
-        periods = ["1", "2", "3", "4", "5"]
-        week_type = self.get_week_number_for_date(date)
-        day = self.get_day_for_date(date)
+            # Only perform reschedule if auto-rescheduling is enabled
+            if self.settings["auto_reschedule"] == True:
+                self.run_reschedule_pass()
+                self.show_schedule()
 
-        max_tasks = SaveManager.load_settings()["max_tasks_lesson"]
-        scheduled = False
-        for period in periods:
-            subject = self.get_subject_for_date_period(date, period)
+        self.arm_reschedule_timer()
 
-            if self.count_tasks_in_period(today_date, period) < max_tasks and ((not subject) or subject == "Supp"):
+    def arm_reschedule_timer(self):
+        # Sleep until the next trigger time, but wake up now and then anyway since after() doesn't notice the machine sleeping or the clock jumping
+        now = self.clock.now()
+        wait = min(self.get_next_reschedule_time(now) - now, MAX_RESCHEDULE_WAIT)
 
-                # Reschedule task
-                c.execute("UPDATE Tasks SET date = ?, period = ? WHERE id = ?", (today_date, period, task_id))
-                scheduled = True
-                conn.commit()
-                return
+        if self.reschedule_timer is not None:
+            self.root.after_cancel(self.reschedule_timer)
+        self.reschedule_timer = self.root.after(max(int(wait.total_seconds() * 1000) + 1000, 1000), self.auto_reschedule_tasks)
 
-        conn.close()
+    def schedule_auto_rescheduling(self):
+        # Catch up on anything missed while the app was closed, then wait for the next trigger time
+        if self.settings["auto_reschedule"] == True:
+            self.run_reschedule_pass()
+            self.show_schedule()
 
-        if not scheduled:
-            self.reschedule_task_to_afternoon(task_id, date)
+        self.last_reschedule_time = self.clock.now()
+        self.reschedule_timer = None
+        self.arm_reschedule_timer()
 
     # --Settings--
 
@@ -750,6 +1960,11 @@ class RevisionManagerApp:
         tk.Label(rechedule_settings_frame, text="Max tasks after school: ").grid(row=2, column=0, sticky="e")
         tk.Spinbox(rechedule_settings_frame, from_=0, to_=100, textvariable=max_tasks_afternoon, validate="key", validatecommand=(rechedule_settings_frame.register(lambda val: val.isdigit() or val == ""), "%P")).grid(row=2, column=1, sticky="w")
 
+        # Length of tasks with no estimate, and of each task slot in periods without start and end times
+        default_task_minutes = tk.IntVar(value=settings["default_task_minutes"])
+        tk.Label(rechedule_settings_frame, text="Default task length (minutes): ").grid(row=3, column=0, sticky="e")
+        tk.Spinbox(rechedule_settings_frame, from_=1, to_=600, textvariable=default_task_minutes, validate="key", validatecommand=(rechedule_settings_frame.register(lambda val: val.isdigit() or val == ""), "%P")).grid(row=3, column=1, sticky="w")
+
         week_settings_frame = tk.LabelFrame(settings_window, text="Week Rotation", pady=10)
         week_settings_frame.pack()
 
@@ -763,13 +1978,28 @@ class RevisionManagerApp:
         tk.Label(week_settings_frame, text="Use lettered weeks: ").grid(row=4, column=0, sticky="e")
         tk.Checkbutton(week_settings_frame, variable=use_lettered_weeks).grid(row=4, column=1, sticky="w")
 
-        # Start week selection
+        # Start week selection (tkcalendar is imported here so it only loads when needed)
+        from tkcalendar import DateEntry
         start_week_date = tk.StringVar(value=settings["start_week_date"])
         tk.Label(week_settings_frame, text="Start week: ").grid(row=5, column=0, sticky="e")
         week_selector = DateEntry(week_settings_frame, textvariable=start_week_date, date_pattern="yyyy-mm-dd")
         week_selector.set_date(datetime.strptime(settings["start_week_date"], "%Y-%m-%d"))
         week_selector.grid(row=5, column=1, sticky="w")
 
+        periods_settings_frame = tk.LabelFrame(settings_window, text="Periods", pady=10)
+        periods_settings_frame.pack(fill="x")
+
+        # Open the periods editor
+        tk.Label(periods_settings_frame, text=f"{len(self.periods)} periods per day").grid(row=0, column=0, sticky="e")
+        tk.Button(periods_settings_frame, text="Edit Periods", command=lambda: self.open_periods_editor(settings_window)).grid(row=0, column=1, sticky="w")
+
+        holidays_settings_frame = tk.LabelFrame(settings_window, text="Holidays", pady=10)
+        holidays_settings_frame.pack(fill="x")
+
+        # Open the holidays editor
+        tk.Label(holidays_settings_frame, text=f"{len(self.holiday_index.ranges)} holidays and term breaks").grid(row=0, column=0, sticky="e")
+        tk.Button(holidays_settings_frame, text="Edit Holidays", command=self.open_holidays_editor).grid(row=0, column=1, sticky="w")
+
         # Save settings to json file
         tk.Button(settings_window, text="Save", command=lambda: save_settings()).pack()
 
@@ -782,105 +2012,414 @@ class RevisionManagerApp:
             if max_tasks_lesson.get() < 1 and max_tasks_afternoon.get() < 1:
                 auto_reschedule.set(False)
 
+            if default_task_minutes.get() < 1:
+                default_task_minutes.set(DEFAULT_SETTINGS["default_task_minutes"])
+
         def save_settings():
             validate_settings()            
 
             settings["auto_reschedule"] = auto_reschedule.get()
             settings["max_tasks_lesson"] = max_tasks_lesson.get()
             settings["max_tasks_afternoon"] = max_tasks_afternoon.get()
+            settings["default_task_minutes"] = default_task_minutes.get()
             settings["week_rotation_length"] = week_rotation_length.get()
             settings["use_lettered_weeks"] = use_lettered_weeks.get()
             settings["start_week_date"] = start_week_date.get()
             SaveManager.update_many_settings(settings)
 
             settings_window.destroy()
+            self.load_timetable()
             self.system_setup()
 
-    # --General Functions--
+    def open_periods_editor(self, settings_window):
+        periods_window = tk.Toplevel(self.root, padx=10, pady=10)
+        periods_window.title("Periods")
+
+        periods_frame = tk.Frame(periods_window)
+        periods_frame.pack()
+
+        # Editable rows, one per period
+        rows = []
+        for period in self.periods:
+            rows.append({
+                "id": period.id,
+                "ordinal": tk.IntVar(value=period.ordinal),
+                "label": tk.StringVar(value=period.label),
+                "start_time": tk.StringVar(value=period.start_time or ""),
+                "end_time": tk.StringVar(value=period.end_time or ""),
+                "kind": tk.StringVar(value=period.kind),
+                "capacity": tk.StringVar(value="" if period.capacity is None else str(period.capacity))
+            })
+
+        def show_rows():
+            for widget in periods_frame.winfo_children():
+                widget.destroy()
+
+            # Column headers
+            for col, header in enumerate(["Order", "Label", "Start (HH:MM)", "End (HH:MM)", "Kind", "Max tasks"]):
+                tk.Label(periods_frame, text=header).grid(row=0, column=col, sticky="w")
+
+            for i, row in enumerate(rows, start=1):
+                tk.Spinbox(periods_frame, from_=1, to_=100, width=4, textvariable=row["ordinal"], validate="key", validatecommand=(periods_frame.register(lambda val: val.isdigit() or val == ""), "%P")).grid(row=i, column=0)
+                tk.Entry(periods_frame, width=14, textvariable=row["label"]).grid(row=i, column=1)
+                tk.Entry(periods_frame, width=8, textvariable=row["start_time"]).grid(row=i, column=2)
+                tk.Entry(periods_frame, width=8, textvariable=row["end_time"]).grid(row=i, column=3)
+                ttk.Combobox(periods_frame, width=12, textvariable=row["kind"], values=PERIOD_KINDS, state="readonly").grid(row=i, column=4)
+                tk.Entry(periods_frame, width=6, textvariable=row["capacity"]).grid(row=i, column=5)
+                tk.Button(periods_frame, text="Remove", command=lambda row=row: remove_row(row)).grid(row=i, column=6)
+
+        # The order of a row, or None while its spinbox is blank
+        def get_ordinal(row):
+            try:
+                return row["ordinal"].get()
+            except tk.TclError:
+                return None
+
+        def add_row():
+            rows.append({
+                "id": None,
+                "ordinal": tk.IntVar(value=max([get_ordinal(row) or 0 for row in rows], default=0) + 1),
+                "label": tk.StringVar(value=str(len(rows) + 1)),
+                "start_time": tk.StringVar(),
+                "end_time": tk.StringVar(),
+                "kind": tk.StringVar(value="lesson"),
+                "capacity": tk.StringVar()
+            })
+            show_rows()
+
+        def remove_row(row):
+            # Periods with subjects or tasks can't be removed
+            if row["id"] is not None and SaveManager.is_period_in_use(row["id"]):
+                messagebox.showerror("Periods", f"Period {row["label"].get()} still has subjects or tasks.", parent=periods_window)
+                return
 
-    def get_task_id(self, task_text, date, period):
-        """ Helper function to retrieve task_id for a specific task text and date."""
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id FROM Tasks WHERE task=? AND date=? AND period=?",
-                (task_text, date.strftime("%Y-%m-%d"), period))
-        result = c.fetchone()
-        conn.close()
-        return result[0] if result else None
+            rows.remove(row)
+            show_rows()
+
+        def save_periods():
+            periods = []
+            for row in rows:
+                label = row["label"].get().strip()
+                ordinal = get_ordinal(row)
+                start_time = row["start_time"].get().strip() or None
+                end_time = row["end_time"].get().strip() or None
+                capacity = row["capacity"].get().strip()
+
+                # Check each period is valid before saving any of them
+                if not label:
+                    messagebox.showerror("Periods", "Every period needs a label.", parent=periods_window)
+                    return
+                if not ordinal:
+                    messagebox.showerror("Periods", f"Order for period {label} must be a whole number from 1.", parent=periods_window)
+                    return
+                try:
+                    for time_str in [start_time, end_time]:
+                        if time_str:
+                            datetime.strptime(time_str, "%H:%M")
+                except ValueError:
+                    messagebox.showerror("Periods", f"Times for period {label} must be in HH:MM format.", parent=periods_window)
+                    return
+                # A period which ends before it starts would count as 0 minutes, so nothing would ever be rescheduled into it
+                if start_time and end_time and datetime.strptime(end_time, "%H:%M") <= datetime.strptime(start_time, "%H:%M"):
+                    messagebox.showerror("Periods", f"Period {label} must end after it starts.", parent=periods_window)
+                    return
+                if capacity and not capacity.isdigit():
+                    messagebox.showerror("Periods", f"Max tasks for period {label} must be a whole number.", parent=periods_window)
+                    return
+
+                periods.append(Period(row["id"], ordinal, label, start_time, end_time, row["kind"].get(), int(capacity) if capacity else None))
+
+            if not periods:
+                messagebox.showerror("Periods", "There must be at least one period.", parent=periods_window)
+                return
 
-    def count_tasks_in_period(self, date, period):
-        """Helper function to count tasks in a given period on a specific date."""
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM Tasks WHERE date = ? AND period = ?", (date, period))
-        count = c.fetchone()[0]
-        conn.close()
-        return count
+            SaveManager.save_periods(periods)
+            periods_window.destroy()
+            settings_window.destroy()
+            self.load_timetable()
+            self.system_setup()
 
-    def get_date_for_day(self, day, week_start_date):
-        days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        delta_days = days_of_week.index(day)
-        return week_start_date + timedelta(days=delta_days)
+        show_rows()
 
-    def get_day_for_date(self, date):
-        days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        return days_of_week[date.weekday()]
+        tk.Label(periods_window, text="Leave max tasks blank to use the auto-rescheduling settings.").pack(anchor="w")
 
-    def get_week_number_for_date(self, date):
-        weeks_since_start = (date - self.start_date).days // 7
-        week_number = (weeks_since_start % self.week_rotation_length) + 1
-        return week_number
+        buttons_frame = tk.Frame(periods_window)
+        buttons_frame.pack()
+        tk.Button(buttons_frame, text="Add Period", command=add_row).grid(row=0, column=0, padx=5)
+        tk.Button(buttons_frame, text="Save", command=save_periods).grid(row=0, column=1, padx=5)
 
-    def get_unique_subjects(self):
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
+    def open_holidays_editor(self):
+        holidays_window = tk.Toplevel(self.root, padx=10, pady=10)
+        holidays_window.title("Holidays")
 
-        # Fetch unique subject names
-        c.execute("SELECT DISTINCT subject FROM Subjects")
-        unique_subjects = [row[0] for row in c.fetchall()]
+        holidays_frame = tk.Frame(holidays_window)
+        holidays_frame.pack()
 
-        conn.close()
-        return unique_subjects
-
-    # Get the subject for a specific date
-    def get_subject_for_date_period(self, date, period):
-        day = self.get_day_for_date(date)
-        week_number = self.get_week_number_for_date(date)
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-
-        if self.is_holiday(date):
-            return None
+        def show_ranges():
+            for widget in holidays_frame.winfo_children():
+                widget.destroy()
 
-        c.execute("SELECT subject FROM Subjects WHERE week=? AND day=? AND period=?", (week_number, day, period))
-        subject = c.fetchone()
-        conn.close()
-        return subject[0] if subject else None
+            if not self.holiday_index.ranges:
+                tk.Label(holidays_frame, text="No holidays").grid(row=0, column=0, sticky="w")
+                return
 
-    # Get the subject for a week
-    def get_subjects_for_week(self, week_start_date):
-        conn = sqlite3.connect(DATABASE_FILE)
-        c = conn.cursor()
-        week_number = self.get_week_number_for_date(week_start_date)
+            # Column headers
+            for col, header in enumerate(["From", "To", "Label"]):
+                tk.Label(holidays_frame, text=header).grid(row=0, column=col, sticky="w", padx=5)
 
-        c.execute("SELECT day, period, subject FROM Subjects WHERE week=?", (week_number,))
-        subjects = c.fetchall()
+            for i, holiday in enumerate(self.holiday_index.ranges, start=1):
+                tk.Label(holidays_frame, text=holiday.start_date).grid(row=i, column=0, sticky="w", padx=5)
+                tk.Label(holidays_frame, text=holiday.end_date).grid(row=i, column=1, sticky="w", padx=5)
+                tk.Label(holidays_frame, text=holiday.label or DEFAULT_HOLIDAY_LABEL).grid(row=i, column=2, sticky="w", padx=5)
+                tk.Button(holidays_frame, text="Remove", command=lambda holiday=holiday: remove_range(holiday)).grid(row=i, column=3)
 
-        # Remove subjects with dates in the Holidays table
-        holidays = set(row[0] for row in c.execute("SELECT date FROM Holidays").fetchall())
+        def remove_range(holiday):
+            self.set_holiday_range(datetime.strptime(holiday.start_date, "%Y-%m-%d"), datetime.strptime(holiday.end_date, "%Y-%m-%d"), None)
+            show_ranges()
+            self.show_schedule()
 
-        subjects = [row for row in subjects if self.get_date_for_day(row[0], week_start_date).strftime("%Y-%m-%d") not in holidays]
+        # Range entry (tkcalendar is imported here so it only loads when needed)
+        from tkcalendar import DateEntry
+        add_frame = tk.LabelFrame(holidays_window, text="Add a holiday or term break", pady=10)
+        add_frame.pack(fill="x", pady=(10, 0))
+
+        tk.Label(add_frame, text="From: ").grid(row=0, column=0, sticky="e")
+        start_entry = DateEntry(add_frame, date_pattern="yyyy-mm-dd")
+        start_entry.set_date(self.current_week_date)
+        start_entry.grid(row=0, column=1, sticky="w")
+
+        tk.Label(add_frame, text="To: ").grid(row=1, column=0, sticky="e")
+        end_entry = DateEntry(add_frame, date_pattern="yyyy-mm-dd")
+        end_entry.set_date(self.current_week_date + timedelta(days=6))
+        end_entry.grid(row=1, column=1, sticky="w")
+
+        label_var = tk.StringVar(value=DEFAULT_HOLIDAY_LABEL)
+        tk.Label(add_frame, text="Label: ").grid(row=2, column=0, sticky="e")
+        tk.Entry(add_frame, textvariable=label_var).grid(row=2, column=1, sticky="w")
+
+        def add_range():
+            start_date = datetime.combine(start_entry.get_date(), datetime.min.time())
+            end_date = datetime.combine(end_entry.get_date(), datetime.min.time())
+            if end_date < start_date:
+                messagebox.showerror("Holidays", "The holiday can't end before it starts.", parent=holidays_window)
+                return
 
-        conn.close()
-        return subjects
+            # Days already off in the range are relabelled, so ranges never overlap
+            self.set_holiday_range(start_date, end_date, label_var.get().strip() or DEFAULT_HOLIDAY_LABEL)
+            show_ranges()
+            self.show_schedule()
 
-# Initialize save data and start app
-SaveManager.init_db()
-SaveManager.init_settings()
+        tk.Button(add_frame, text="Add", command=add_range).grid(row=3, column=0, columnspan=2)
+
+        show_ranges()
+
+# Makes sure only one copy of the app runs on the same data, handing later launches over to it
+class InstanceLock:
+
+    def __init__(self, lock_file=LOCK_FILE):
+        self.lock_file = lock_file
+        self.server = None
+        self.requests = queue.Queue() # Requests handed over from later launches
+        self.on_request = None # Called from the background thread after each request is queued, once the app can handle them
+
+    def acquire(self, request):
+        """Become the running instance, or hand the request over to the one already running. Returns False if it was handed over,
+        or None if a running copy held the lock but never answered."""
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.hand_off(request):
+                return False
+
+            # Listen on a local port and claim the lock file with it
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            self.server.listen()
+            try:
+                lock_fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self.server.close()
+                self.server = None
+
+                # The lock was left behind by a copy which didn't close properly
+                if self.is_lock_stale():
+                    print("Removing stale lock file...")
+                    try:
+                        os.remove(self.lock_file)
+                    except FileNotFoundError:
+                        pass # Another launch removed it first
+                    continue
+
+                # The copy holding the lock is still writing it, so give it a moment
+                time.sleep(0.2)
+                continue
+
+            with os.fdopen(lock_fd, "w") as file:
+                file.write(self.get_lock_contents())
+
+            # Answer later launches straight away, even while the window is still being built
+            self.listen()
+            return True
+
+        return None
+
+    def get_lock_contents(self):
+        return f"{self.server.getsockname()[1]}\n{os.getpid()}\n"
+
+    def read_lock_file(self):
+        # The port and process id in the lock file, or None if it can't be read (or is still being written)
+        try:
+            with open(self.lock_file) as file:
+                return int(file.readline()), int(file.readline())
+        except (OSError, ValueError):
+            return None
 
-root = tk.Tk()
-appicon = tk.PhotoImage(file=os.path.join(get_assets_path(), "icon.png"))
-root.iconphoto(False, appicon)
+    def is_lock_stale(self):
+        """Whether the lock file belongs to a copy which is no longer running."""
+        lock = self.read_lock_file()
+        if lock is None:
+            # A lock file which is still empty after a couple of seconds was left by a copy which died while writing it
+            try:
+                return time.time() - os.path.getmtime(self.lock_file) > 2
+            except OSError:
+                return False
+
+        # The port is only written once the running copy is listening on it, so a refused connection means it has gone
+        # (its process id can't be trusted, since the system may have given it to another program after a crash)
+        try:
+            socket.create_connection(("127.0.0.1", lock[0]), timeout=1).close()
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def hand_off(self, request):
+        """Send a request to the running instance. Returns False if there isn't one."""
+        lock = self.read_lock_file()
+        if lock is None:
+            return False
+
+        try:
+            with socket.create_connection(("127.0.0.1", lock[0]), timeout=1) as connection:
+                connection.sendall((json.dumps(request) + "\n").encode())
+                return connection.makefile().readline().strip() == "ok"
+        except OSError:
+            return False
+
+    def listen(self):
+        """Accept requests from later launches in the background, queueing them until the app sets on_request."""
+        def accept_requests():
+            while True:
+                try:
+                    connection, address = self.server.accept()
+                except OSError:
+                    return # Server was closed
+
+                with connection:
+                    try:
+                        connection.settimeout(1)
+                        self.requests.put(json.loads(connection.makefile().readline()))
+                        connection.sendall(b"ok\n")
+                    except (OSError, ValueError):
+                        continue
+
+                if self.on_request is not None:
+                    self.on_request()
+
+        threading.Thread(target=accept_requests, daemon=True).start()
+
+    def release(self):
+        if self.server is None:
+            return
+
+        # Only remove the lock file if it's still ours, and not one another copy took over. It goes before the server closes,
+        # so a later launch can't see the refused port, take over the lock and then have its new lock file removed here
+        if self.read_lock_file() == (self.server.getsockname()[1], os.getpid()):
+            try:
+                os.remove(self.lock_file)
+            except OSError:
+                pass
+        self.server.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Revision Manager")
+    parser.add_argument("--timing", action="store_true", help="print how long each startup phase took and save it to startup_timing.txt")
+    parser.add_argument("--export", choices=TimetableExporter.FORMATS, help="export weeks of the timetable without opening the window")
+    parser.add_argument("--start", help="first week to export, as any date in the week (YYYY-MM-DD, defaults to this week)")
+    parser.add_argument("--weeks", type=int, default=1, help="number of weeks to export")
+    parser.add_argument("--output", help="file to export to (a folder for PNG pages)")
+    return parser.parse_args()
+
+def export_timetable(args):
+    SaveManager.init_db()
+    SaveManager.init_settings()
+    timetable = Timetable()
+
+    first_week_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else timetable.clock.today()
+    output = args.output or ("timetable_pages" if args.export == "png" else f"timetable.{args.export}")
+
+    start = time.perf_counter()
+    pages = TimetableExporter(timetable).export(args.export, first_week_date, args.weeks, output)
+    print(f"Exported {pages} week{"s" if pages != 1 else ""} to {output} in {time.perf_counter() - start:.2f} s")
+
+def main():
+    mark_startup("Imports")
+    args = parse_args()
+
+    # Exporting only reads the data, so it doesn't need the window or the instance lock
+    if args.export:
+        export_timetable(args)
+        return
+
+    # Hand over to the copy of the app which is already running, if there is one
+    instance_lock = InstanceLock()
+    acquired = instance_lock.acquire({"command": "show", "argv": sys.argv[1:]})
+    if acquired is None:
+        # The windowed build has no console, so say so in a message box rather than silently not opening
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Revision Manager", "Revision Manager seems to be running already but isn't responding.\n\n"
+                             f"If it isn't open, delete {os.path.abspath(instance_lock.lock_file)} and try again.")
+        root.destroy()
+        return
+    if not acquired:
+        print("Revision Manager is already running.")
+        return
+
+    try:
+        run_app(instance_lock, args.timing)
+    finally:
+        instance_lock.release()
+
+def run_app(instance_lock, timing=False):
+    # Initialize save data and start app
+    SaveManager.init_db()
+    mark_startup("Database ready")
+    SaveManager.init_settings()
+    mark_startup("Settings ready")
+
+    root = tk.Tk()
+    appicon = tk.PhotoImage(file=os.path.join(get_assets_path(), "icon.png"))
+    root.iconphoto(False, appicon)
+
+    app = RevisionManagerApp(root, timing=timing)
+    mark_startup("Window built")
+
+    # Handle launches handed over from other copies of the app on the Tk thread
+    def notify_app():
+        try:
+            root.event_generate("<<InstanceRequest>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            pass # Window isn't running, the request stays queued for the next one
+
+    root.bind("<<InstanceRequest>>", lambda event: app.handle_instance_requests(instance_lock.requests))
+    instance_lock.on_request = notify_app
+
+    # Then handle any which arrived while the window was being built
+    app.handle_instance_requests(instance_lock.requests)
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
 
-app = RevisionManagerApp(root)
-root.mainloop()
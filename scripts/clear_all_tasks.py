@@ -6,8 +6,12 @@ DATABASE_FILE = "timetable.db"
 conn = sqlite3.connect(DATABASE_FILE)
 cursor = conn.cursor()
 
-# Drop tasks table
+# Drop tasks table, and the log of their moves
 cursor.execute("DROP TABLE IF EXISTS Tasks")
+cursor.execute("DROP TABLE IF EXISTS TaskMoves")
+
+# Reset the schema version so the app recreates the tables on next launch
+cursor.execute("PRAGMA user_version = 0")
 
 # Commit changes and close the connection
 conn.commit()
@@ -15,7 +15,7 @@ CREATE TABLE Subjects (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     day TEXT NOT NULL,
     week TEXT NOT NULL,
-    period TEXT NOT NULL,
+    period_id INTEGER NOT NULL REFERENCES Periods(id),
     subject TEXT NOT NULL
 )
 """)
@@ -37,15 +37,19 @@ week2_data = {
     "Friday": [None, "Maths", "PSHE", "Computer Science", "Art"]   # Corrected row
 }
 
+# Look up the period ids for periods 1 to 5 (the app creates the Periods table on first launch)
+cursor.execute("SELECT label, id FROM Periods")
+period_ids = dict(cursor.fetchall())
+
 # Insert data into Subjects table
-for week, data in [("A", week1_data), ("B", week2_data)]:  # Using integers for weeks
+for week, data in [(1, week1_data), (2, week2_data)]:  # Using integers for weeks
     for day, subjects in data.items():
         for period, subject in enumerate(subjects, start=1):
             if subject:  # Only insert if there's a subject in that period
                 cursor.execute("""
-                INSERT INTO Subjects (day, week, period, subject)
+                INSERT INTO Subjects (day, week, period_id, subject)
                 VALUES (?, ?, ?, ?)
-                """, (day, week, str(period), subject))  # Store period as a string
+                """, (day, week, period_ids[str(period)], subject))  # Store the period by its id
 
 # Commit changes and close the connection
 conn.commit()
@@ -0,0 +1,229 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Import the app from the folder above this one
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import revision_manager as rm
+
+SUBJECTS = ["Maths", "Computer Science", "Art", "EPQ"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# Timetable which checks every move the rescheduler makes before doing it
+class SimulatedTimetable(rm.Timetable):
+
+    def __init__(self, clock):
+        super().__init__(clock)
+        self.moves = 0
+        self.violations = []
+
+    def move_tasks(self, moves, reason):
+        when = self.clock.now().strftime("%Y-%m-%d %H:%M")
+        moved_into = {} # (date, period id) to the tasks moved into it
+
+        for task_id, date_str, period_id in moves:
+            period = self.period_lookup[period_id]
+
+            # Tasks should never be moved into the past
+            if date_str < self.clock.today().strftime("%Y-%m-%d"):
+                self.violations.append(f"{when}: task {task_id} moved into the past ({date_str})")
+
+            # Tasks should only be moved into lessons with no subject or a study subject
+            if period.kind == "lesson":
+                subject = self.get_subject_for_date_period(datetime.strptime(date_str, "%Y-%m-%d"), period_id)
+                if subject and subject not in rm.STUDY_SUBJECTS:
+                    self.violations.append(f"{when}: task {task_id} moved into a {subject} lesson on {date_str}")
+
+            moved_into.setdefault((date_str, period_id), []).append(task_id)
+
+        # Periods should only go over their length when one long task fills an empty period
+        conn = sqlite3.connect(rm.DATABASE_FILE)
+        c = conn.cursor()
+        for (date_str, period_id), task_ids in moved_into.items():
+            period = self.period_lookup[period_id]
+            c.execute("SELECT effort FROM Tasks WHERE date = ? AND period_id = ?", (date_str, period_id))
+            used = sum(self.get_task_effort(effort) for effort, in c.fetchall())
+            c.execute(f"SELECT effort FROM Tasks WHERE id IN ({", ".join("?" * len(task_ids))})", task_ids)
+            added = sum(self.get_task_effort(effort) for effort, in c.fetchall())
+            if used + added > self.get_period_minutes(period) and not (used == 0 and len(task_ids) == 1):
+                self.violations.append(f"{when}: {len(task_ids)} tasks moved into full period {period.label} on {date_str} ({used + added} of {self.get_period_minutes(period)} minutes)")
+        conn.close()
+
+        self.moves += len(moves)
+        return super().move_tasks(moves, reason)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay days of task creation, completion and auto-rescheduling against a scratch database.")
+    parser.add_argument("--days", type=int, default=120, help="number of days to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, so runs can be repeated")
+    parser.add_argument("--start", default="2024-11-18", help="first simulated day (YYYY-MM-DD, a Monday)")
+    parser.add_argument("--tasks-per-day", type=float, default=3, help="average number of tasks added each day")
+    parser.add_argument("--completion-rate", type=float, default=0.6, help="chance of completing each task on the day it is scheduled")
+    parser.add_argument("--holiday-rate", type=float, default=0.03, help="chance of a holiday starting on any given day")
+    parser.add_argument("--max-tasks-lesson", type=int, default=1, help="max tasks per lesson")
+    parser.add_argument("--max-tasks-afternoon", type=int, default=2, help="max tasks after school")
+    parser.add_argument("--due-rate", type=float, default=0.5, help="chance of a new task having a due date")
+    parser.add_argument("--estimate-rate", type=float, default=0.5, help="chance of a new task having an estimated length")
+    parser.add_argument("--database", help="keep the simulated database at this path instead of a temporary folder")
+    return parser.parse_args()
+
+def setup_timetable(args, rng):
+    # Settings for the simulation, written to the scratch settings file
+    rm.SaveManager.init_db()
+    rm.SaveManager.init_settings()
+    rm.SaveManager.update_many_settings({
+        "auto_reschedule": True,
+        "max_tasks_lesson": args.max_tasks_lesson,
+        "max_tasks_afternoon": args.max_tasks_afternoon,
+        "week_rotation_length": 2,
+        "start_week_date": args.start
+    })
+
+    # Random two-week timetable, with some study periods and some free ones
+    conn = sqlite3.connect(rm.DATABASE_FILE)
+    c = conn.cursor()
+    lesson_ids = [period.id for period in rm.SaveManager.load_periods() if period.kind == "lesson"]
+    for week in [1, 2]:
+        for day in DAYS:
+            for period_id in lesson_ids:
+                roll = rng.random()
+                if roll < 0.6:
+                    c.execute("INSERT INTO Subjects (week, day, period_id, subject) VALUES (?, ?, ?, ?)", (week, day, period_id, rng.choice(SUBJECTS)))
+                elif roll < 0.75:
+                    c.execute("INSERT INTO Subjects (week, day, period_id, subject) VALUES (?, ?, ?, ?)", (week, day, period_id, rm.STUDY_SUBJECTS[0]))
+    conn.commit()
+    conn.close()
+
+def run_pass(timetable, pass_times, late):
+    start = time.perf_counter()
+    late.update(timetable.run_reschedule_pass())
+    pass_times.append(time.perf_counter() - start)
+
+def check_overdue(timetable):
+    # After a pass there should be no incomplete tasks left on earlier days
+    conn = sqlite3.connect(rm.DATABASE_FILE)
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM Tasks WHERE date < ? AND completed = 0", (timetable.clock.today().strftime("%Y-%m-%d"),))
+    overdue = c.fetchone()[0]
+    conn.close()
+
+    if overdue:
+        timetable.violations.append(f"{timetable.clock.now():%Y-%m-%d %H:%M}: {overdue} incomplete tasks left on earlier days")
+
+def simulate(args):
+    rng = random.Random(args.seed)
+    setup_timetable(args, rng)
+
+    clock = rm.SimulatedClock(datetime.strptime(args.start, "%Y-%m-%d"))
+    timetable = SimulatedTimetable(clock)
+    periods = timetable.periods
+
+    created = {} # Task id to the date it was first scheduled for
+    due_dates = {} # Task id to its due date, for tasks which have one
+    late = set() # Tasks the rescheduler warned would miss their due date
+    missed = 0 # Tasks completed after their due date
+    drifts = [] # Days each task drifted by before it was completed
+    pass_times = []
+
+    conn = sqlite3.connect(rm.DATABASE_FILE)
+    c = conn.cursor()
+
+    for day in range(args.days):
+        today = clock.today()
+        today_str = today.strftime("%Y-%m-%d")
+
+        # Midnight pass
+        run_pass(timetable, pass_times, late)
+        check_overdue(timetable)
+
+        # Occasionally start a holiday sometime in the next two weeks
+        if rng.random() < args.holiday_rate:
+            holiday_start = today + timedelta(days=rng.randint(1, 14))
+            timetable.set_holiday_range(holiday_start, holiday_start + timedelta(days=rng.randint(0, 9)))
+
+        # Add new tasks for the coming week
+        for _ in range(rng.randint(0, round(args.tasks_per_day * 2))):
+            task_date = today + timedelta(days=rng.randint(0, 7))
+            due_date = (task_date + timedelta(days=rng.randint(0, 14))).strftime("%Y-%m-%d") if rng.random() < args.due_rate else None
+            effort = rng.choice([15, 30, 45, 60, 90]) if rng.random() < args.estimate_rate else None
+            c.execute("INSERT INTO Tasks (task, date, period_id, completed, due_date, priority, effort) VALUES (?, ?, ?, 0, ?, ?, ?)",
+                      (f"Task {len(created) + 1}", task_date.strftime("%Y-%m-%d"), rng.choice(periods).id, due_date, rng.randrange(len(rm.PRIORITIES)), effort))
+            created[c.lastrowid] = task_date.strftime("%Y-%m-%d")
+            if due_date:
+                due_dates[c.lastrowid] = due_date
+
+        # Complete some of today's tasks
+        c.execute("SELECT id FROM Tasks WHERE date = ? AND completed = 0 ORDER BY id", (today_str,))
+        for task_id, in c.fetchall():
+            if rng.random() < args.completion_rate:
+                c.execute("UPDATE Tasks SET completed = 1 WHERE id = ?", (task_id,))
+                drifts.append((today - datetime.strptime(created[task_id], "%Y-%m-%d")).days)
+                if task_id in due_dates and today_str > due_dates[task_id]:
+                    missed += 1
+        conn.commit()
+
+        # After school pass, at the time the app's timer would wake up for it
+        clock.advance(timetable.get_next_reschedule_time(clock.now()) - clock.now())
+        run_pass(timetable, pass_times, late)
+        check_overdue(timetable)
+
+        # Move on to the next midnight pass
+        clock.advance(timetable.get_next_reschedule_time(clock.now()) - clock.now())
+
+    # Tasks still waiting at the end count as drifting up to their current date
+    c.execute("SELECT id, date FROM Tasks WHERE completed = 0")
+    waiting = c.fetchall()
+    for task_id, date_str in waiting:
+        drifts.append((datetime.strptime(date_str, "%Y-%m-%d") - datetime.strptime(created[task_id], "%Y-%m-%d")).days)
+        if task_id in due_dates and date_str > due_dates[task_id]:
+            missed += 1
+    conn.close()
+
+    deadlines = (len(due_dates), missed, len(late))
+    return timetable, created, drifts, pass_times, len(waiting), deadlines
+
+def report(args, timetable, created, drifts, pass_times, waiting, deadlines):
+    total_time = sum(pass_times)
+    print(f"Simulated {args.days} days from {args.start} (seed {args.seed})")
+    print(f"  Tasks created:        {len(created)}")
+    print(f"  Tasks still waiting:  {waiting}")
+    print(f"  Reschedule passes:    {len(pass_times)} in {total_time * 1000:.1f} ms ({total_time / len(pass_times) * 1000:.2f} ms per pass, slowest {max(pass_times) * 1000:.2f} ms)")
+    print(f"  Tasks moved:          {timetable.moves} ({timetable.moves / total_time if total_time else 0:.0f} moves/s)")
+
+    if drifts:
+        drifts.sort()
+        print(f"  Drift (days):         mean {statistics.mean(drifts):.2f}, median {statistics.median(drifts)}, 95th {drifts[int(len(drifts) * 0.95)]}, max {drifts[-1]}")
+
+    with_due_dates, missed, warned = deadlines
+    print(f"  Deadlines:            {missed} of {with_due_dates} tasks with due dates missed them ({warned} flagged late by the rescheduler)")
+
+    print(f"  Invariant violations: {len(timetable.violations)}")
+    for violation in timetable.violations[:20]:
+        print(f"    {violation}")
+    if len(timetable.violations) > 20:
+        print(f"    ...and {len(timetable.violations) - 20} more")
+
+def main():
+    args = parse_args()
+
+    if args.database and os.path.exists(args.database):
+        sys.exit(f"{args.database} already exists, pick a new path so real data isn't overwritten.")
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        # Point the app at scratch files so real data is never touched
+        rm.DATABASE_FILE = args.database or os.path.join(scratch_dir, "timetable.db")
+        rm.SETTINGS_FILE = os.path.join(scratch_dir, "settings.json")
+
+        timetable, created, drifts, pass_times, waiting, deadlines = simulate(args)
+        report(args, timetable, created, drifts, pass_times, waiting, deadlines)
+
+    sys.exit(1 if timetable.violations else 0)
+
+if __name__ == "__main__":
+    main()